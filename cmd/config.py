@@ -1,72 +1,125 @@
 import os
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import Tuple
 from dotenv import load_dotenv
 
-load_dotenv()
+_env_loaded = False
 
-@dataclass
+def _ensure_env_loaded():
+    global _env_loaded
+    if _env_loaded:
+        return
+
+    # In production the variables come from the container environment,
+    # so there is no .env file worth parsing.
+    if os.environ.get("APP_ENV") != "production":
+        load_dotenv(override=False)
+
+    _env_loaded = True
+
+_ensure_env_loaded()
+
+_env = os.environ
+
+def _env_bool(name: str, default: str) -> bool:
+    return _env.get(name, default).lower() == "true"
+
+_PG_HOST = _env.get("PG_HOST", "localhost")
+_PG_PORT = int(_env.get("PG_PORT", "5432"))
+_PG_USER = _env.get("PG_USER", "postgres")
+_PG_PASSWORD = _env.get("PG_PASSWORD", "")
+_PG_DATABASE = _env.get("PG_DATABASE", "deribit_trades")
+_PG_POOL_MIN = int(_env.get("PG_POOL_MIN", "5"))
+# Pooled PostgreSQL throughput levels off around 25-50 connections; keep the
+# ceiling well below max_connections in config/postgresql.conf (200).
+_PG_POOL_MAX = int(_env.get("PG_POOL_MAX", "50"))
+
+_DERIBIT_ENABLED = _env_bool("DERIBIT_ENABLED", "true")
+_OKX_ENABLED = _env_bool("OKX_ENABLED", "true")
+_BINANCE_ENABLED = _env_bool("BINANCE_ENABLED", "false")
+_BYBIT_ENABLED = _env_bool("BYBIT_ENABLED", "false")
+_CME_ENABLED = _env_bool("CME_ENABLED", "false")
+_OHLC_ENABLED = _env_bool("OHLC_ENABLED", "true")
+_COLLECTION_INTERVAL = int(_env.get("COLLECTION_INTERVAL", "60"))
+
+_TELEGRAM_BOT_TOKEN = _env.get("TELEGRAM_BOT_TOKEN", "")
+_TELEGRAM_ADMIN_CHAT_ID = _env.get("TELEGRAM_ADMIN_CHAT_ID", "")
+_TELEGRAM_NOTIFICATIONS_ENABLED = _env_bool("TELEGRAM_NOTIFICATIONS_ENABLED", "true")
+_TELEGRAM_ALERT_COOLDOWN = int(_env.get("TELEGRAM_ALERT_COOLDOWN", "300"))
+
+@dataclass(slots=True, frozen=True)
 class DatabaseConfig:
-    host: str = os.getenv("PG_HOST", "localhost")
-    port: int = int(os.getenv("PG_PORT", "5432"))
-    user: str = os.getenv("PG_USER", "postgres")
-    password: str = os.getenv("PG_PASSWORD", "")
-    database: str = os.getenv("PG_DATABASE", "deribit_trades")
+    host: str = _PG_HOST
+    port: int = _PG_PORT
+    user: str = _PG_USER
+    password: str = _PG_PASSWORD
+    database: str = _PG_DATABASE
+    min_size: int = _PG_POOL_MIN
+    max_size: int = _PG_POOL_MAX
+    dsn: str = field(init=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(
+            self,
+            "dsn",
+            f"postgresql://{self.user}:{self.password}@{self.host}:{self.port}/{self.database}"
+        )
 
     def get_connection_string(self) -> str:
-        return f"postgresql://{self.user}:{self.password}@{self.host}:{self.port}/{self.database}"
+        return self.dsn
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class CollectorConfig:
-    deribit_enabled: bool = os.getenv("DERIBIT_ENABLED", "true").lower() == "true"
-    okx_enabled: bool = os.getenv("OKX_ENABLED", "true").lower() == "true"
-    binance_enabled: bool = os.getenv("BINANCE_ENABLED", "false").lower() == "true"
-    bybit_enabled: bool = os.getenv("BYBIT_ENABLED", "false").lower() == "true"
-    cme_enabled: bool = os.getenv("CME_ENABLED", "false").lower() == "true"
-    ohlc_enabled: bool = os.getenv("OHLC_ENABLED", "true").lower() == "true"
+    deribit_enabled: bool = _DERIBIT_ENABLED
+    okx_enabled: bool = _OKX_ENABLED
+    binance_enabled: bool = _BINANCE_ENABLED
+    bybit_enabled: bool = _BYBIT_ENABLED
+    cme_enabled: bool = _CME_ENABLED
+    ohlc_enabled: bool = _OHLC_ENABLED
 
-    collection_interval: int = int(os.getenv("COLLECTION_INTERVAL", "60"))
+    collection_interval: int = _COLLECTION_INTERVAL
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class TelegramConfig:
-    bot_token: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
-    admin_chat_id: str = os.getenv("TELEGRAM_ADMIN_CHAT_ID", "")
-    notifications_enabled: bool = os.getenv("TELEGRAM_NOTIFICATIONS_ENABLED", "true").lower() == "true"
-    alert_cooldown: int = int(os.getenv("TELEGRAM_ALERT_COOLDOWN", "300"))
+    bot_token: str = _TELEGRAM_BOT_TOKEN
+    admin_chat_id: str = _TELEGRAM_ADMIN_CHAT_ID
+    notifications_enabled: bool = _TELEGRAM_NOTIFICATIONS_ENABLED
+    alert_cooldown: int = _TELEGRAM_ALERT_COOLDOWN
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Config:
-    database: DatabaseConfig
-    collectors: CollectorConfig
-    telegram: TelegramConfig
-
-    def __init__(self):
-        self.database = DatabaseConfig()
-        self.collectors = CollectorConfig()
-        self.telegram = TelegramConfig()
-
-    def validate(self) -> List[str]:
+    database: DatabaseConfig = field(default_factory=DatabaseConfig)
+    collectors: CollectorConfig = field(default_factory=CollectorConfig)
+    telegram: TelegramConfig = field(default_factory=TelegramConfig)
+
+    def validate(self) -> Tuple[str, ...]:
+        database = self.database
+        collectors = self.collectors
+        telegram = self.telegram
         errors = []
 
-        if not self.database.user:
+        if not database.user:
             errors.append("PG_USER is required")
 
-        if not self.database.password:
+        if not database.password:
             errors.append("PG_PASSWORD is required")
 
-        if not self.database.database:
+        if not database.database:
             errors.append("PG_DATABASE is required")
 
-        if self.collectors.collection_interval <= 0:
+        if database.min_size < 0 or database.max_size < max(database.min_size, 1):
+            errors.append("PG_POOL_MAX must be at least 1 and not less than PG_POOL_MIN")
+
+        if collectors.collection_interval <= 0:
             errors.append("COLLECTION_INTERVAL must be greater than 0")
 
-        if self.telegram.notifications_enabled:
-            if not self.telegram.bot_token:
+        if telegram.notifications_enabled:
+            if not telegram.bot_token:
                 errors.append("TELEGRAM_BOT_TOKEN is required when notifications are enabled")
 
-            if not self.telegram.admin_chat_id:
+            if not telegram.admin_chat_id:
                 errors.append("TELEGRAM_ADMIN_CHAT_ID is required when notifications are enabled")
 
-        return errors
+        return tuple(errors)
 
 config = Config()
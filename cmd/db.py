@@ -1,13 +1,24 @@
+import asyncio
 import asyncpg
 import logging
+from pathlib import Path
 from typing import Optional
 from .config import config
 
 logger = logging.getLogger(__name__)
 
+MIGRATION_PATH = Path(__file__).resolve().parent.parent / 'migrations' / 'init.sql'
+_MIGRATION_SQL = MIGRATION_PATH.read_text()
+
+# Upper bound on trade batches written at the same time across all collectors
+WRITER_CONCURRENCY = 4
+
+POOL_CLOSE_TIMEOUT = 5
+
 class DatabaseManager:
     def __init__(self):
         self.pool: Optional[asyncpg.Pool] = None
+        self.write_limiter: Optional[asyncio.Semaphore] = None
 
     async def init(self):
         try:
@@ -21,10 +32,14 @@ class DatabaseManager:
     async def _create_connection_pool(self):
         try:
             self.pool = await asyncpg.create_pool(
-                config.database.get_connection_string(),
-                min_size=1,
-                max_size=20
+                config.database.dsn,
+                min_size=config.database.min_size,
+                max_size=config.database.max_size,
+                max_inactive_connection_lifetime=300,
+                # JIT only slows down the short inserts/lookups the collectors run
+                server_settings={'jit': 'off'}
             )
+            self.write_limiter = asyncio.Semaphore(min(config.database.max_size, WRITER_CONCURRENCY))
             logger.info("Connection pool created successfully")
         except Exception as error:
             logger.error(f"Error creating connection pool: {error}")
@@ -33,11 +48,8 @@ class DatabaseManager:
     async def _run_migrations(self):
         try:
             async with self.pool.acquire() as conn:
-                with open('migrations/init.sql', 'r') as f:
-                    migration_sql = f.read()
-
                 logger.info("Running database migrations...")
-                await conn.execute(migration_sql)
+                await conn.execute(_MIGRATION_SQL)
                 logger.info("Database migrations completed successfully")
         except Exception as error:
             logger.error(f"Error running migrations: {error}")
@@ -45,7 +57,11 @@ class DatabaseManager:
 
     async def close(self):
         if self.pool:
-            await self.pool.close()
-            logger.info("Database connection pool closed")
+            try:
+                await asyncio.wait_for(self.pool.close(), timeout=POOL_CLOSE_TIMEOUT)
+                logger.info("Database connection pool closed")
+            except asyncio.TimeoutError:
+                self.pool.terminate()
+                logger.warning("Database connection pool did not close in time, terminated")
 
 db_manager = DatabaseManager()
@@ -6,20 +6,18 @@ from typing import List
 from .config import config
 from .db import db_manager
 from internal.shared.logger import setup_logger
-from internal.collectors.deribit_collector import DeribitCollector
-from internal.collectors.okx_collector import OKXCollector
-from internal.collectors.bybit_collector import BybitCollector
-from internal.collectors.binance_collector import BinanceCollector
-from internal.telegram.bot_manager import telegram_manager
-from internal.collectors.ohlc_collector import OHLCCollector
 
 logger = logging.getLogger(__name__)
 
+COLLECTOR_STOP_TIMEOUT = 10
+
 class CollectorOrchestrator:
     def __init__(self):
         self.collectors = []
         self.running = False
         self.telegram_task = None
+        self.telegram_manager = None
+        self._stopping = False
 
     async def init(self):
         try:
@@ -31,6 +29,8 @@ class CollectorOrchestrator:
 
             await db_manager.init()
 
+            from internal.telegram.bot_manager import telegram_manager
+            self.telegram_manager = telegram_manager
             await telegram_manager.init()
 
             await self._init_collectors()
@@ -43,30 +43,35 @@ class CollectorOrchestrator:
 
     async def _init_collectors(self):
         if config.collectors.deribit_enabled:
+            from internal.collectors.deribit_collector import DeribitCollector
             deribit_collector = DeribitCollector()
             await deribit_collector.init()
             self.collectors.append(deribit_collector)
             logger.info("Deribit collector initialized")
 
         if config.collectors.okx_enabled:
+            from internal.collectors.okx_collector import OKXCollector
             okx_collector = OKXCollector()
             await okx_collector.init()
             self.collectors.append(okx_collector)
             logger.info("OKX collector initialized")
 
         if config.collectors.bybit_enabled:
+            from internal.collectors.bybit_collector import BybitCollector
             bybit_collector = BybitCollector()
             await bybit_collector.init()
             self.collectors.append(bybit_collector)
             logger.info("Bybit collector initialized")
 
         if config.collectors.binance_enabled:
+            from internal.collectors.binance_collector import BinanceCollector
             binance_collector = BinanceCollector()
             await binance_collector.init()
             self.collectors.append(binance_collector)
             logger.info("Binance collector initialized")
 
         if config.collectors.ohlc_enabled:
+            from internal.collectors.ohlc_collector import OHLCCollector
             ohlc_collector = OHLCCollector()
             await ohlc_collector.init()
             self.collectors.append(ohlc_collector)
@@ -78,28 +83,34 @@ class CollectorOrchestrator:
         self.running = True
         logger.info("Starting all collectors...")
 
-        tasks = []
-
-        for collector in self.collectors:
-            task = asyncio.create_task(collector.start())
-            tasks.append(task)
-
-        if telegram_manager.bot:
-            self.telegram_task = asyncio.create_task(telegram_manager.start())
-            tasks.append(self.telegram_task)
-
         try:
-            await asyncio.gather(*tasks)
-        except Exception as error:
-            logger.error(f"Error in collector tasks: {error}")
+            async with asyncio.TaskGroup() as tg:
+                for collector in self.collectors:
+                    tg.create_task(collector.start())
+
+                if self.telegram_manager and self.telegram_manager.bot:
+                    self.telegram_task = tg.create_task(self.telegram_manager.start())
+        except* Exception as group:
+            for error in group.exceptions:
+                logger.error(f"Error in collector tasks: {error}")
             await self.stop()
 
     async def stop(self):
+        if self._stopping:
+            return
+
+        self._stopping = True
         self.running = False
         logger.info("Stopping all collectors...")
 
-        for collector in self.collectors:
-            await collector.stop()
+        if self.collectors:
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(collector.stop() for collector in self.collectors), return_exceptions=True),
+                    timeout=COLLECTOR_STOP_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Timed out waiting for collectors to stop")
 
         if self.telegram_task:
             self.telegram_task.cancel()
@@ -108,7 +119,8 @@ class CollectorOrchestrator:
             except asyncio.CancelledError:
                 pass
 
-        await telegram_manager.stop()
+        if self.telegram_manager:
+            await self.telegram_manager.stop()
         await db_manager.close()
         logger.info("All collectors stopped")
 
@@ -117,12 +129,22 @@ async def main():
 
     orchestrator = CollectorOrchestrator()
 
-    def signal_handler(signum, frame):
-        logger.info(f"Received signal {signum}, shutting down gracefully...")
+    loop = asyncio.get_running_loop()
+    # Python 3.12+: tasks run inline until their first real suspension instead of waiting a loop turn
+    eager_task_factory = getattr(asyncio, 'eager_task_factory', None)
+    if eager_task_factory is not None:
+        loop.set_task_factory(eager_task_factory)
+    logger.info(
+        f"Event loop: {type(loop).__module__}.{type(loop).__name__}, "
+        f"eager tasks: {'on' if eager_task_factory is not None else 'off'}"
+    )
+
+    def signal_handler(sig: signal.Signals):
+        logger.info(f"Received signal {sig.name}, shutting down gracefully...")
         asyncio.create_task(orchestrator.stop())
 
-    signal.signal(signal.SIGTERM, signal_handler)
-    signal.signal(signal.SIGINT, signal_handler)
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, signal_handler, sig)
 
     try:
         await orchestrator.init()
@@ -135,5 +157,14 @@ async def main():
         await orchestrator.stop()
         sys.exit(1)
 
+def install_event_loop_policy():
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("uvloop is not installed, falling back to the default asyncio event loop")
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
 if __name__ == "__main__":
+    install_event_loop_policy()
     asyncio.run(main())
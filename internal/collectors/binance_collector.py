@@ -1,185 +1,237 @@
 import asyncio
-import json
-import websockets
+import time
+from websockets import ConnectionClosedOK
+from websockets.asyncio.client import connect as ws_connect
 from datetime import datetime
-from typing import Dict, Any, List, Set, Optional
+from collections import OrderedDict, deque
+from operator import itemgetter
+from typing import Dict, Any, List, Optional
 from decimal import Decimal
 
-from ..shared.base_collector import BaseCollector
-from ..shared.date_converter import normalize_binance_instrument_name
+from ..shared.base_collector import TradeCollector
+from ..shared.json_decoder import decode_frames
+from ..shared.trade_parsers import parse_binance_trade
+
+UNDERLYING_IDX = {'BTC': 0, 'ETH': 1}
+
+# One per writer on shutdown; workers exit after draining everything queued before it
+QUEUE_SENTINEL = None
+
+INSERT_TRADE_SQL = """
+INSERT INTO {table_name} (
+    trade_id, contracts, amount, instrument_name,
+    direction, price, timestamp
+)
+VALUES ($1, $2, $3, $4, $5, $6, to_timestamp($7) AT TIME ZONE 'UTC')
+ON CONFLICT (trade_id) DO NOTHING
+"""
+
+TRADE_RECORD = itemgetter(
+    'trade_id', 'contracts', 'amount', 'instrument_name', 'direction', 'price', 'timestamp'
+)
+
+class BinanceCollector(TradeCollector):
+    _trade_to_record = staticmethod(TRADE_RECORD)
 
-class BinanceCollector(BaseCollector):
     def __init__(self):
         super().__init__("binance")
         self.underlying_assets = ['BTC', 'ETH']
-        self._stop_event = asyncio.Event()
         self.ws_tasks = []
-        self.stream_stats = {
-            'BTC': {'messages': 0, 'trades': 0, 'last_trade': None, 'connected': False},
-            'ETH': {'messages': 0, 'trades': 0, 'last_trade': None, 'connected': False}
+        self.table_names = {u: f"binance_{u.lower()}_trades" for u in self.underlying_assets}
+        self.stream_names = {u: f"{u}@trade" for u in self.underlying_assets}
+        self._insert_queries = {
+            table_name: INSERT_TRADE_SQL.format(table_name=table_name)
+            for table_name in self.table_names.values()
         }
-        self.processed_trade_ids: Dict[str, Set[str]] = {
-            'BTC': set(),
-            'ETH': set()
+        # Flat per-underlying counters indexed by UNDERLYING_IDX, kept off dicts in the hot path
+        self.msg_counts = [0] * len(UNDERLYING_IDX)
+        self.trade_counts = [0] * len(UNDERLYING_IDX)
+        self._last_trade_ts: List[Optional[float]] = [None] * len(UNDERLYING_IDX)
+        self._connected = [False] * len(UNDERLYING_IDX)
+        self.processed_trade_ids: Dict[str, OrderedDict] = {
+            'BTC': OrderedDict(),
+            'ETH': OrderedDict()
         }
         self.max_cache_size = 5000
-        self.trade_queue = asyncio.Queue()
-        self._trade_processor_task = None
-        self._db_lock = asyncio.Lock()
+        self.max_batch_size = 128
+        self.flush_timeout = 0.02
+        self.worker_count = 4
+        self.trade_queue = asyncio.Queue(maxsize=10000)
+        self._trade_processor_tasks = []
+        self.max_decode_batch = 256
+        self.max_pending_frames = 10000
+        self._raw_frames = {underlying: deque() for underlying in self.underlying_assets}
+        self._frames_ready = {underlying: asyncio.Event() for underlying in self.underlying_assets}
+        self._decoder_tasks = []
+        self.queue_stats = {'queue_depth': 0, 'dropped': 0, 'write_latency': 0.0}
 
     async def _init_collector(self):
         await self._load_last_trade_ids()
-        self._trade_processor_task = asyncio.create_task(self._process_trade_queue())
+        self._trade_processor_tasks = [
+            asyncio.create_task(self._process_trade_queue())
+            for _ in range(self.worker_count)
+        ]
         await self._start_options_websockets()
 
     async def _load_last_trade_ids(self):
         try:
             for underlying in self.underlying_assets:
-                table_name = f"binance_{underlying.lower()}_trades"
+                table_name = self.table_names[underlying]
                 query = f"SELECT trade_id FROM {table_name} ORDER BY timestamp DESC LIMIT 1000"
 
-                async with self._db_lock:
-                    async with self.db_pool.acquire() as connection:
-                        try:
-                            rows = await connection.fetch(query)
-                            trade_ids = {str(row['trade_id']) for row in rows}
-                            self.processed_trade_ids[underlying] = trade_ids
-                        except Exception:
-                            self.processed_trade_ids[underlying] = set()
+                async with self.db_pool.acquire() as connection:
+                    try:
+                        rows = await connection.fetch(query)
+                        # Oldest first, so eviction drops the oldest ids
+                        trade_ids = OrderedDict.fromkeys(row[0] for row in reversed(rows))
+                        self.processed_trade_ids[underlying] = trade_ids
+                    except Exception:
+                        self.processed_trade_ids[underlying] = OrderedDict()
         except Exception as e:
             self.logger.error(f"Error loading trade IDs: {e}")
             for underlying in self.underlying_assets:
-                self.processed_trade_ids[underlying] = set()
+                self.processed_trade_ids[underlying] = OrderedDict()
 
     async def _process_trade_queue(self):
-        while not self._stop_event.is_set():
-            try:
-                trade_item = await asyncio.wait_for(self.trade_queue.get(), timeout=1.0)
-                trade_data, underlying = trade_item
-
-                await self._process_single_trade(trade_data, underlying)
+        while True:
+            first_item = await self.trade_queue.get()
+            if first_item is QUEUE_SENTINEL:
                 self.trade_queue.task_done()
+                return
 
-            except asyncio.TimeoutError:
-                continue
+            batch = [first_item]
+            stopping = False
+
+            try:
+                stopping = await self._fill_batch(batch)
+                await self._save_trade_batch(batch)
             except Exception as e:
                 self.logger.error(f"Error in trade queue processor: {e}")
                 await asyncio.sleep(0.1)
+            finally:
+                for _ in range(len(batch) + stopping):
+                    self.trade_queue.task_done()
 
-    async def _process_single_trade(self, trade_data: Dict[str, Any], underlying: str):
-        try:
-            symbol = trade_data.get('s', '')
-            trade_id_raw = trade_data.get('t', '')
-            price_raw = trade_data.get('p', '')
-            quantity_raw = trade_data.get('q', '')
-            direction_code = trade_data.get('S', '1')
-            trade_time = trade_data.get('T', 0)
-
-            try:
-                trade_id = int(trade_id_raw) if trade_id_raw else None
-            except (ValueError, TypeError):
+            if stopping:
                 return
 
-            try:
-                price = float(price_raw) if price_raw else None
-            except (ValueError, TypeError):
-                return
+    async def _fill_batch(self, batch: List[tuple]) -> bool:
+        # Returns True when the shutdown sentinel was taken while filling
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_timeout
 
-            try:
-                quantity = float(quantity_raw) if quantity_raw else None
-            except (ValueError, TypeError):
-                return
+        while len(batch) < self.max_batch_size:
+            if not self.trade_queue.empty():
+                item = self.trade_queue.get_nowait()
+            else:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
 
-            if not all([symbol, trade_id is not None, price is not None, quantity is not None]):
-                return
+                try:
+                    item = await asyncio.wait_for(self.trade_queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
 
-            trade_id_str = str(trade_id)
-            if trade_id_str and trade_id_str in self.processed_trade_ids[underlying]:
-                return
+            if item is QUEUE_SENTINEL:
+                return True
+            batch.append(item)
 
-            if isinstance(trade_time, (int, float)) and trade_time > 0:
-                if trade_time > 1e12:
-                    timestamp = datetime.fromtimestamp(trade_time / 1000.0)
-                else:
-                    timestamp = datetime.fromtimestamp(trade_time)
-            else:
-                timestamp = datetime.utcnow()
+        return False
 
-            if str(direction_code) == "-1":
-                direction = "sell"
-            else:
-                direction = "buy"
-
-            abs_quantity = abs(quantity)
-            amount = abs_quantity * price
-
-            trade = {
-                'trade_id': trade_id,
-                'contracts': abs_quantity,
-                'amount': amount,
-                'instrument_name': normalize_binance_instrument_name(symbol),
-                'direction': direction,
-                'price': price,
-                'timestamp': timestamp
-            }
+    async def _save_trade_batch(self, batch: List[tuple]):
+        trades_by_underlying: Dict[str, List[Dict[str, Any]]] = {}
+        process = self._process_single_trade
+        group = trades_by_underlying.setdefault
 
-            table_name = f"binance_{underlying.lower()}_trades"
+        for trade_data, underlying in batch:
+            trade = process(trade_data, underlying)
+            if trade:
+                group(underlying, []).append(trade)
 
-            async with self._db_lock:
-                await self.save_trades([trade], table_name)
+        for underlying, trades in trades_by_underlying.items():
+            table_name = self.table_names[underlying]
 
-            if trade_id_str:
-                self.processed_trade_ids[underlying].add(trade_id_str)
-                self._cleanup_cache(underlying)
+            started = time.monotonic()
+            try:
+                await self.save_trades(trades, table_name)
+            except Exception as e:
+                self.logger.error(f"Error saving trades for {underlying}: {e}")
+                self.stats['failed_requests'] += 1
+                continue
+            finally:
+                self.queue_stats['write_latency'] = time.monotonic() - started
+                self.queue_stats['queue_depth'] = self.trade_queue.qsize()
 
-            self.stream_stats[underlying]['trades'] += 1
-            self.stream_stats[underlying]['last_trade'] = datetime.utcnow()
-            self.stats['successful_requests'] += 1
+            cache = self.processed_trade_ids[underlying]
+            for trade in trades:
+                cache[trade['trade_id']] = None
+            self._cleanup_cache(underlying)
 
+            idx = UNDERLYING_IDX[underlying]
+            self.trade_counts[idx] += len(trades)
+            self._last_trade_ts[idx] = time.time()
+            self.stats['successful_requests'] += len(trades)
+
+    def _process_single_trade(self, trade_data: Dict[str, Any], underlying: str) -> Optional[Dict[str, Any]]:
+        try:
+            return parse_binance_trade(trade_data, self.processed_trade_ids[underlying])
         except Exception as e:
             self.logger.error(f"Error processing trade data for {underlying}: {e}")
             self.stats['failed_requests'] += 1
+            return None
 
     async def _start_options_websockets(self):
         for underlying in self.underlying_assets:
+            self._decoder_tasks.append(asyncio.create_task(self._decode_options_frames(underlying)))
             task = asyncio.create_task(self._options_websocket_stream(underlying))
             self.ws_tasks.append(task)
 
     async def _options_websocket_stream(self, underlying: str):
-        stream_name = f"{underlying}@trade"
+        stream_name = self.stream_names[underlying]
         uri = f"wss://nbstream.binance.com/eoptions/stream?streams={stream_name}"
 
         reconnect_delay = 1
         max_reconnect_delay = 60
         attempt = 0
+        idx = UNDERLYING_IDX[underlying]
+        msg_counts = self.msg_counts
+        frames = self._raw_frames[underlying]
+        frames_ready = self._frames_ready[underlying]
+        max_pending_frames = self.max_pending_frames
 
         while not self._stop_event.is_set():
             attempt += 1
             try:
-                async with websockets.connect(
+                async with ws_connect(
                     uri,
-                    timeout=30,
+                    open_timeout=30,
                     ping_interval=20,
                     ping_timeout=10,
-                    extra_headers={"User-Agent": "hedgie-gateways/1.0"}
+                    max_size=2 ** 20,
+                    user_agent_header="hedgie-gateways/1.0"
                 ) as websocket:
 
-                    self.stream_stats[underlying]['connected'] = True
+                    self._connected[idx] = True
                     reconnect_delay = 1
                     attempt = 0
 
-                    async for message in websocket:
-                        if self._stop_event.is_set():
-                            break
+                    while not self._stop_event.is_set():
+                        # Raw bytes: orjson parses them directly, so skip websockets' UTF-8 decode
+                        message = await websocket.recv(decode=False)
 
-                        try:
-                            await self._handle_options_message(message, underlying)
-                        except Exception as e:
-                            self.logger.error(f"Error processing Options message for {underlying}: {e}")
+                        msg_counts[idx] += 1
+                        # Only buffer the raw frame here; decoding happens in _decode_options_frames
+                        if len(frames) >= max_pending_frames:
+                            self.queue_stats['dropped'] += 1
                             continue
+                        frames.append(message)
+                        frames_ready.set()
 
+            except ConnectionClosedOK:
+                self._connected[idx] = False
             except Exception as e:
-                self.stream_stats[underlying]['connected'] = False
+                self._connected[idx] = False
                 if not self._stop_event.is_set():
                     self.logger.error(f"{underlying} Options WebSocket error: {e}")
 
@@ -187,84 +239,99 @@ class BinanceCollector(BaseCollector):
                 await asyncio.sleep(reconnect_delay)
                 reconnect_delay = min(reconnect_delay * 2, max_reconnect_delay)
 
-    async def _handle_options_message(self, message, underlying: str):
-        try:
-            self.stream_stats[underlying]['messages'] += 1
-
-            if isinstance(message, str):
-                data = json.loads(message)
-            else:
-                data = message
+    async def _decode_options_frames(self, underlying: str):
+        frames = self._raw_frames[underlying]
+        frames_ready = self._frames_ready[underlying]
 
-            trade_data = None
-
-            if isinstance(data, dict):
-                if 'stream' in data and 'data' in data:
-                    if data.get('stream') == f"{underlying}@trade":
-                        trade_data = data['data']
-                elif data.get('e') == 'trade':
-                    trade_data = data
-                elif isinstance(data, list):
-                    for item in data:
-                        if isinstance(item, dict) and item.get('e') == 'trade':
-                            await self.trade_queue.put((item, underlying))
-                    return
-
-            if trade_data:
-                await self.trade_queue.put((trade_data, underlying))
-
-        except Exception as e:
-            self.logger.error(f"Error handling Options message for {underlying}: {e}")
+        while not self._stop_event.is_set():
+            await frames_ready.wait()
+            frames_ready.clear()
+
+            while frames:
+                batch = [frames.popleft() for _ in range(min(len(frames), self.max_decode_batch))]
+                try:
+                    # orjson holds the GIL while parsing, so an executor would not free the loop
+                    decoded = decode_frames(batch)
+                    if len(decoded) < len(batch):
+                        self.logger.warning(f"Dropped {len(batch) - len(decoded)} malformed {underlying} Options frames")
+
+                    for data in decoded:
+                        self._handle_options_message(data, underlying)
+                except Exception as e:
+                    self.logger.error(f"Error handling Options messages for {underlying}: {e}")
+
+                # Bounded batches, then a yield, keep a backlog from holding the loop
+                await asyncio.sleep(0)
+
+    def _handle_options_message(self, data, underlying: str):
+        if isinstance(data, list):
+            enqueue = self._enqueue_trade
+            for item in data:
+                if isinstance(item, dict) and item.get('e') == 'trade':
+                    enqueue(item, underlying)
+            return
+
+        if not isinstance(data, dict):
+            return
+
+        trade_data = None
+        if 'stream' in data and 'data' in data:
+            if data.get('stream') == self.stream_names[underlying]:
+                trade_data = data['data']
+        elif data.get('e') == 'trade':
+            trade_data = data
+
+        if trade_data:
+            self._enqueue_trade(trade_data, underlying)
+
+    def _enqueue_trade(self, trade_data: Dict[str, Any], underlying: str):
+        # Never block the websocket read loop; shed load when the writers fall behind
+        try:
+            self.trade_queue.put_nowait((trade_data, underlying))
+        except asyncio.QueueFull:
+            self.queue_stats['dropped'] += 1
 
     def _cleanup_cache(self, underlying: str):
         cache = self.processed_trade_ids[underlying]
-        if len(cache) > self.max_cache_size:
-            excess = len(cache) - int(self.max_cache_size * 0.8)
-            cache_list = list(cache)
-            for _ in range(excess):
-                if cache_list:
-                    cache.discard(cache_list.pop(0))
+        while len(cache) > self.max_cache_size:
+            cache.popitem(last=False)
 
     async def _collect_data(self):
         await asyncio.sleep(1)
 
-    async def _insert_trade_async(self, conn, trade: Dict[str, Any], table_name: str):
-        query = f"""
-        INSERT INTO {table_name} (
-            trade_id, contracts, amount, instrument_name,
-            direction, price, timestamp
-        )
-        VALUES ($1, $2, $3, $4, $5, $6, $7)
-        ON CONFLICT (trade_id) DO NOTHING
-        """
-
-        await conn.execute(query,
-            trade.get('trade_id'),
-            trade.get('contracts'),
-            trade.get('amount'),
-            trade.get('instrument_name'),
-            trade.get('direction'),
-            trade.get('price'),
-            trade.get('timestamp')
-        )
-
-    def _insert_trade(self, cursor, trade: Dict[str, Any], table_name: str):
-        pass
+    @property
+    def stream_stats(self) -> Dict[str, Dict[str, Any]]:
+        stats = {}
+        for underlying, idx in UNDERLYING_IDX.items():
+            last_ts = self._last_trade_ts[idx]
+            stats[underlying] = {
+                'messages': self.msg_counts[idx],
+                'trades': self.trade_counts[idx],
+                'last_trade': datetime.utcfromtimestamp(last_ts) if last_ts else None,
+                'connected': self._connected[idx]
+            }
+        return stats
+
+    def _log_stats(self):
+        super()._log_stats()
+        self.logger.info(f"Queue stats: {self.queue_stats}")
+        self.logger.info(f"Stream stats: {self.stream_stats}")
 
     async def stop(self):
         self._stop_event.set()
 
-        if self._trade_processor_task:
-            self._trade_processor_task.cancel()
-            try:
-                await self._trade_processor_task
-            except asyncio.CancelledError:
-                pass
+        # Stop the producers first so nothing lands behind the sentinels
+        producers = self.ws_tasks + self._decoder_tasks
+        for task in producers:
+            task.cancel()
+
+        if producers:
+            await asyncio.gather(*producers, return_exceptions=True)
 
-        if not self.trade_queue.empty():
-            await self.trade_queue.join()
+        for _ in self._trade_processor_tasks:
+            await self.trade_queue.put(QUEUE_SENTINEL)
 
-        if self.ws_tasks:
-            await asyncio.gather(*self.ws_tasks, return_exceptions=True)
+        if self._trade_processor_tasks:
+            await asyncio.gather(*self._trade_processor_tasks, return_exceptions=True)
 
         await super().stop()
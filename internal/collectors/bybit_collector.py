@@ -1,23 +1,52 @@
 import asyncio
 import aiohttp
-from datetime import datetime
-from typing import Dict, Any, List, Optional, Set
-from ..shared.base_collector import BaseCollector
-
-class BybitCollector(BaseCollector):
+import orjson
+import time
+from collections import OrderedDict
+from operator import itemgetter
+from typing import Dict, Any, List, Optional
+from ..shared.base_collector import TradeCollector
+from ..shared.trade_parsers import parse_bybit_trade
+
+OPTION_TYPES = {'C', 'P'}
+
+INSERT_TRADE_SQL = """
+INSERT INTO {table_name} (
+    trade_id, contracts, mark_price, amount, instrument_name,
+    index_price, direction, price, iv, timestamp
+)
+VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+ON CONFLICT (trade_id) DO NOTHING
+"""
+
+TRADE_RECORD = itemgetter(
+    'trade_id', 'contracts', 'mark_price', 'amount', 'instrument_name',
+    'index_price', 'direction', 'price', 'iv', 'timestamp'
+)
+
+class BybitCollector(TradeCollector):
+    _trade_to_record = staticmethod(TRADE_RECORD)
 
     def __init__(self):
         super().__init__("bybit")
         self.base_url = None
         self.session = None
         self.currency_pairs = ['BTC', 'ETH']
+        self.table_names = {c: f"bybit_{c.lower()}_trades" for c in self.currency_pairs}
+        self._insert_queries = {
+            table_name: INSERT_TRADE_SQL.format(table_name=table_name)
+            for table_name in self.table_names.values()
+        }
 
-        self.processed_trade_ids: Dict[str, Set[str]] = {
-            'BTC': set(),
-            'ETH': set()
+        self.processed_trade_ids: Dict[str, OrderedDict] = {
+            'BTC': OrderedDict(),
+            'ETH': OrderedDict()
         }
 
         self.max_cache_size = 10000
+        # Minimum spacing between two recent-trade requests for the same currency
+        self.min_fetch_interval = 2
+        self._last_fetch = {currency: 0.0 for currency in self.currency_pairs}
 
     async def _init_collector(self):
         import os
@@ -38,7 +67,7 @@ class BybitCollector(BaseCollector):
     async def _load_last_trade_ids(self):
         try:
             for currency in self.currency_pairs:
-                table_name = f"bybit_{currency.lower()}_trades"
+                table_name = self.table_names[currency]
 
                 query = f"""
                 SELECT trade_id FROM {table_name}
@@ -49,57 +78,75 @@ class BybitCollector(BaseCollector):
                 async with self.db_pool.acquire() as connection:
                     try:
                         rows = await connection.fetch(query)
-                        trade_ids = {row['trade_id'] for row in rows}
+                        trade_ids = OrderedDict.fromkeys(row[0] for row in reversed(rows))
                         self.processed_trade_ids[currency] = trade_ids
 
                     except Exception:
-                        self.processed_trade_ids[currency] = set()
+                        self.processed_trade_ids[currency] = OrderedDict()
 
         except Exception:
             pass
 
     async def _collect_data(self):
-        for currency in self.currency_pairs:
-            try:
-                self.stats['total_requests'] += 1
+        await asyncio.gather(*(
+            self._collect_currency(currency)
+            for currency in self.currency_pairs
+        ))
 
-                trades = await self._fetch_trades(currency)
+    async def _collect_currency(self, currency: str):
+        try:
+            wait = self._last_fetch[currency] + self.min_fetch_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_fetch[currency] = time.monotonic()
 
-                if trades:
-                    options_trades = self._filter_options(trades)
+            self.stats['total_requests'] += 1
 
-                    if options_trades:
-                        new_trades = self._filter_new_trades(options_trades, currency)
+            trades = await self._fetch_trades(currency)
 
-                        if new_trades:
-                            processed_trades = []
-                            for trade in new_trades:
-                                processed_trade = self._process_single_trade(trade, currency)
-                                if processed_trade:
-                                    processed_trades.append(processed_trade)
+            if trades:
+                new_trades = self._filter_new_options(trades, currency)
 
-                            if processed_trades:
-                                table_name = f"bybit_{currency.lower()}_trades"
-                                await self.save_trades(processed_trades, table_name)
+                if new_trades:
+                    processed_trades = []
+                    process = self._process_single_trade
+                    append = processed_trades.append
+                    for trade in new_trades:
+                        processed_trade = process(trade, currency)
+                        if processed_trade:
+                            append(processed_trade)
 
-                                self._update_cache(processed_trades, currency)
-                                self.stats['total_trades_saved'] += len(processed_trades)
+                    if processed_trades:
+                        table_name = self.table_names[currency]
+                        await self.save_trades(processed_trades, table_name)
 
-                self.stats['successful_requests'] += 1
-                await asyncio.sleep(2)
+                        self._update_cache(processed_trades, currency)
+                        self.stats['total_trades_saved'] += len(processed_trades)
 
-            except Exception as e:
-                self.logger.error(f"Error collecting {currency} trades: {e}")
-                self.stats['failed_requests'] += 1
+            self.stats['successful_requests'] += 1
 
-    def _filter_new_trades(self, trades: List[Dict[str, Any]], currency: str) -> List[Dict[str, Any]]:
+        except Exception as e:
+            self.logger.error(f"Error collecting {currency} trades: {e}")
+            self.stats['failed_requests'] += 1
+
+    def _filter_new_options(self, trades: List[Dict[str, Any]], currency: str) -> List[Dict[str, Any]]:
         new_trades = []
+        append = new_trades.append
         cached_ids = self.processed_trade_ids[currency]
 
         for trade in trades:
-            trade_id = trade.get('execId', '')
+            get = trade.get
+            symbol = get('symbol', '')
+            if not isinstance(symbol, str) or '-' not in symbol:
+                continue
+
+            parts = symbol.split('-')
+            if len(parts) < 4 or not (parts[-1] in OPTION_TYPES or parts[-2] in OPTION_TYPES):
+                continue
+
+            trade_id = get('execId', '')
             if trade_id and trade_id not in cached_ids:
-                new_trades.append(trade)
+                append(trade)
 
         return new_trades
 
@@ -109,13 +156,10 @@ class BybitCollector(BaseCollector):
         for trade in processed_trades:
             trade_id = trade.get('trade_id')
             if trade_id:
-                cache.add(trade_id)
+                cache[trade_id] = None
 
-        if len(cache) > self.max_cache_size:
-            excess = len(cache) - self.max_cache_size
-            cache_list = list(cache)
-            for _ in range(excess):
-                cache.discard(cache_list.pop(0))
+        while len(cache) > self.max_cache_size:
+            cache.popitem(last=False)
 
     async def _fetch_trades(self, currency: str) -> List[Dict[str, Any]]:
         try:
@@ -131,7 +175,7 @@ class BybitCollector(BaseCollector):
                 if response.status != 200:
                     response.raise_for_status()
 
-                data = await response.json()
+                data = orjson.loads(await response.read())
 
                 ret_code = data.get("retCode", -1)
                 if ret_code != 0:
@@ -145,88 +189,12 @@ class BybitCollector(BaseCollector):
         except Exception:
             raise
 
-    def _filter_options(self, trades: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        filtered = []
-        for trade in trades:
-            symbol = trade.get('symbol', '')
-            if isinstance(symbol, str) and '-' in symbol:
-                parts = symbol.split('-')
-                if len(parts) >= 4 and (parts[-1] in {'C', 'P'} or parts[-2] in {'C', 'P'}):
-                    filtered.append(trade)
-
-        return filtered
-
     def _process_single_trade(self, trade: Dict[str, Any], currency: str) -> Optional[Dict[str, Any]]:
         try:
-            exec_id = trade.get("execId", "")
-            symbol = trade.get("symbol", "")
-            price = self._safe_float(trade.get("price"))
-            size = self._safe_float(trade.get("size"))
-            side = trade.get("side", "")
-            timestamp = trade.get("time", "")
-
-            mark_price = self._safe_float(trade.get("mP"))
-            index_price = self._safe_float(trade.get("iP"))
-            iv = self._safe_float(trade.get("iv"))
-
-            trade_timestamp = None
-            if timestamp:
-                try:
-                    trade_timestamp = datetime.fromtimestamp(int(timestamp) / 1000)
-                except (ValueError, TypeError):
-                    trade_timestamp = datetime.utcnow()
-
-            processed_trade = {
-                "trade_id": exec_id,
-                "contracts": size,
-                "mark_price": mark_price,
-                "amount": price * size if price and size else None,
-                "instrument_name": symbol,
-                "index_price": index_price,
-                "direction": side,
-                "price": price,
-                "iv": iv,
-                "timestamp": trade_timestamp
-            }
-
-            return processed_trade
-
+            return parse_bybit_trade(trade)
         except Exception:
             return None
 
-    def _safe_float(self, value) -> Optional[float]:
-        if value is None or value == "":
-            return None
-        try:
-            return float(value)
-        except (ValueError, TypeError):
-            return None
-
-    async def _insert_trade_async(self, conn, trade: Dict[str, Any], table_name: str):
-        query = f"""
-        INSERT INTO {table_name} (
-            trade_id, contracts, mark_price, amount, instrument_name,
-            index_price, direction, price, iv, timestamp
-        )
-        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
-        """
-
-        await conn.execute(query,
-            trade.get('trade_id'),
-            trade.get('contracts'),
-            trade.get('mark_price'),
-            trade.get('amount'),
-            trade.get('instrument_name'),
-            trade.get('index_price'),
-            trade.get('direction'),
-            trade.get('price'),
-            trade.get('iv'),
-            trade.get('timestamp')
-        )
-
-    def _insert_trade(self, cursor, trade: Dict[str, Any], table_name: str):
-        pass
-
     async def stop(self):
         if self.session and not self.session.closed:
             await self.session.close()
@@ -1,74 +1,330 @@
 import aiohttp
 import asyncio
-from datetime import datetime, timedelta
-from typing import Dict, Any, List
-from ..shared.base_collector import BaseCollector
+import orjson
+import time
+from websockets import ConnectionClosedOK
+from websockets.asyncio.client import connect as ws_connect
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from ..shared.base_collector import TradeCollector
 
-class DeribitCollector(BaseCollector):
+OPTION_SUFFIXES = ('-C', '-P')
+
+WS_URL = "wss://www.deribit.com/ws/api/v2"
+HEARTBEAT_INTERVAL = 30
+BACKFILL_PAGE_SIZE = 1000
+WRITER_DRAIN_TIMEOUT = 10
+QUEUE_SENTINEL = None
+
+REQUEST_ID_PLACEHOLDER = b'"id":0'
+
+def build_request_template(method: str, params: Dict[str, Any]) -> bytes:
+    return orjson.dumps({'jsonrpc': '2.0', 'id': 0, 'method': method, 'params': params})
+
+INSERT_TRADE_SQL = """
+INSERT INTO {table_name} (
+    trade_id, block_trade_leg_count, contracts, block_trade_id, combo_id, tick_direction,
+    mark_price, amount, trade_seq, instrument_name, index_price, direction, price, iv,
+    liquidation, combo_trade_id, timestamp
+)
+VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17)
+ON CONFLICT (trade_id) DO NOTHING
+"""
+
+class DeribitCollector(TradeCollector):
     def __init__(self):
         super().__init__("deribit")
         self.base_url = "https://www.deribit.com/api/v2"
         self.currency_pairs = ['BTC', 'ETH']
         self.session = None
+        self.channels = {f"trades.option.{currency}.100ms": currency for currency in self.currency_pairs}
+        self.table_names = {
+            currency: (f"all_{currency.lower()}_trades", f"{currency.lower()}_block_trades")
+            for currency in self.currency_pairs
+        }
+
+        self._ws_task: Optional[asyncio.Task] = None
+        self._websocket = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self.trade_queue = asyncio.Queue(maxsize=10000)
+        self.max_queue_batch = 64
+        self.max_pending_frames = 1024
+        self._request_id = 0
+        # Serialized once; only the request id is patched in per send
+        self._request_templates = {
+            'public/set_heartbeat': build_request_template('public/set_heartbeat', {'interval': HEARTBEAT_INTERVAL}),
+            'public/subscribe': build_request_template('public/subscribe', {'channels': list(self.channels)}),
+            'public/unsubscribe': build_request_template('public/unsubscribe', {'channels': list(self.channels)}),
+            'public/test': build_request_template('public/test', {})
+        }
+        # Timestamp up to which every trade is committed; backfills start from here
+        self._last_trade_ts: Dict[str, Optional[int]] = {currency: None for currency in self.currency_pairs}
+        # A dropped or unsaved batch opens a gap; it closes once a complete backfill started after it
+        self._gap_events: Dict[str, int] = {currency: 0 for currency in self.currency_pairs}
+        self._gaps_covered: Dict[str, int] = {currency: 0 for currency in self.currency_pairs}
+        self._stream_seen = False
+
+        self._insert_queries = {
+            table_name: INSERT_TRADE_SQL.format(table_name=table_name)
+            for table_pair in self.table_names.values()
+            for table_name in table_pair
+        }
 
     async def _init_collector(self):
         timeout = aiohttp.ClientTimeout(total=30)
-        connector = aiohttp.TCPConnector(limit=100, limit_per_host=30)
+        # Backfill requests are bursty; keep the TLS connection and DNS answer warm between them
+        connector = aiohttp.TCPConnector(limit=100, limit_per_host=30, ttl_dns_cache=300, keepalive_timeout=60)
         self.session = aiohttp.ClientSession(
             timeout=timeout,
             connector=connector,
-            headers={'User-Agent': 'Hedgie-Collector/1.0'}
+            headers={'User-Agent': 'Hedgie-Collector/1.0'},
+            json_serialize=lambda obj: orjson.dumps(obj).decode(),
+            raise_for_status=True
         )
         self.logger.info("Successfully connected to Deribit API")
 
-    async def _collect_data(self):
-        current_time = datetime.utcnow()
-        one_minute_ago = current_time - timedelta(minutes=1)
+        self._writer_task = asyncio.create_task(self._process_trade_queue())
+        self._ws_task = asyncio.create_task(self._websocket_stream())
+
+    async def _collect_data(self) -> bool:
+        # Trades arrive over the websocket; this restarts the stream if it died and refills open gaps
+        if self._ws_task and self._ws_task.done() and not self._stop_event.is_set():
+            self.logger.warning("Deribit websocket task exited, restarting")
+            self._ws_task = asyncio.create_task(self._websocket_stream())
+
+        gapped = [currency for currency in self.currency_pairs if self._has_gap(currency)]
+        if gapped and not self._stop_event.is_set():
+            await self._backfill_trades(gapped)
+
+        # Only trades or heartbeats since the last cycle count as data for the stall monitor
+        received, self._stream_seen = self._stream_seen, False
+        return received
 
-        start_timestamp = int(one_minute_ago.timestamp() * 1000)
-        end_timestamp = int(current_time.timestamp() * 1000)
+    async def _websocket_stream(self):
+        reconnect_delay = 1
+        max_reconnect_delay = 60
 
-        for currency in self.currency_pairs:
+        while not self._stop_event.is_set():
             try:
-                self.stats['total_requests'] += 1
+                async with ws_connect(
+                    WS_URL,
+                    ping_interval=30,
+                    ping_timeout=10,
+                    max_size=10 ** 7
+                ) as websocket:
+                    self._websocket = websocket
+                    await self._setup_heartbeat(websocket)
+                    await self._subscribe_to_market_trades(websocket)
+                    reconnect_delay = 1
 
-                trades = await self._fetch_trades(currency, start_timestamp, end_timestamp)
+                    # Cover the gap since the last streamed trade (or the last minute on startup)
+                    await self._backfill_trades()
 
-                if trades:
-                    options_trades = self._filter_options(trades)
+                    # Recv only hands frames over; a full queue pauses reads and lets TCP push back
+                    frames = asyncio.Queue(maxsize=self.max_pending_frames)
+                    decoder_task = asyncio.create_task(self._decode_messages(websocket, frames))
+                    try:
+                        while not self._stop_event.is_set():
+                            # Raw bytes straight into orjson, skipping websockets' UTF-8 decode
+                            await frames.put(await websocket.recv(decode=False))
+                    finally:
+                        decoder_task.cancel()
+                        await asyncio.gather(decoder_task, return_exceptions=True)
 
-                    if options_trades:
-                        processed_trades = []
-                        for trade in options_trades:
-                            processed_trade = self._process_trade(trade)
-                            if processed_trade:
-                                processed_trades.append(processed_trade)
+            except asyncio.CancelledError:
+                raise
+            except ConnectionClosedOK:
+                pass
+            except Exception as e:
+                if not self._stop_event.is_set():
+                    self.logger.error(f"Deribit WebSocket error: {e}")
+            finally:
+                self._websocket = None
 
-                        if processed_trades:
-                            await self.save_trades(processed_trades, f"all_{currency.lower()}_trades")
+            if not self._stop_event.is_set():
+                await asyncio.sleep(reconnect_delay)
+                reconnect_delay = min(reconnect_delay * 2, max_reconnect_delay)
 
-                            block_trades = self._filter_block_trades(processed_trades)
-                            if block_trades:
-                                await self.save_trades(block_trades, f"{currency.lower()}_block_trades")
-                                self.logger.info(f"Saved {len(block_trades)} block trades for {currency}")
+    def _get_next_id(self) -> int:
+        self._request_id += 1
+        return self._request_id
 
-                self.stats['successful_requests'] += 1
+    async def _send_request(self, websocket, method: str):
+        request_id = f'"id":{self._get_next_id()}'.encode()
+        payload = self._request_templates[method].replace(REQUEST_ID_PLACEHOLDER, request_id, 1)
+        await websocket.send(payload.decode())
 
-            except Exception as error:
-                self.logger.error(f"❌ Error fetching {currency} trades: {error}")
-                self.stats['failed_requests'] += 1
+    async def _setup_heartbeat(self, websocket):
+        await self._send_request(websocket, 'public/set_heartbeat')
+
+    async def _subscribe_to_market_trades(self, websocket):
+        await self._send_request(websocket, 'public/subscribe')
+        self.logger.info(f"Subscribed to Deribit channels: {', '.join(self.channels)}")
+
+    async def _unsubscribe_from_market_trades(self, websocket):
+        await self._send_request(websocket, 'public/unsubscribe')
+
+    async def _decode_messages(self, websocket, frames: asyncio.Queue):
+        # Single consumer keeps frames in order for heartbeats and the backfill watermark
+        while True:
+            message = await frames.get()
+            try:
+                await self._process_message(websocket, orjson.loads(message))
+            except orjson.JSONDecodeError as e:
+                self.logger.warning(f"Malformed Deribit frame: {e}")
+            except Exception as e:
+                self.logger.error(f"Error processing Deribit message: {e}")
+
+    async def _process_message(self, websocket, data: Dict[str, Any]):
+        method = data.get('method')
+
+        if method == 'subscription':
+            self._stream_seen = True
+            self._handle_market_data(data.get('params', {}))
+        elif method == 'heartbeat':
+            self._stream_seen = True
+            await self._handle_heartbeat(websocket, data.get('params', {}))
+        elif 'error' in data:
+            self.logger.error(f"Deribit request {data.get('id')} failed: {data['error']}")
+
+    async def _handle_heartbeat(self, websocket, params: Dict[str, Any]):
+        if params.get('type') == 'test_request':
+            await self._send_request(websocket, 'public/test')
+
+    def _handle_market_data(self, params: Dict[str, Any]):
+        currency = self.channels.get(params.get('channel'))
+        trades = params.get('data')
+        if not currency or not trades:
+            return
 
-    def _process_trade(self, trade: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            timestamp_ms = trade.get('timestamp')
-            if timestamp_ms:
-                timestamp_dt = datetime.fromtimestamp(timestamp_ms / 1000.0)
-                trade['timestamp'] = timestamp_dt
+            self.trade_queue.put_nowait((currency, trades))
+        except asyncio.QueueFull:
+            self.logger.warning(f"Deribit trade queue full, dropping {len(trades)} {currency} trades")
+            self._mark_gap(currency)
+
+    async def _process_trade_queue(self):
+        while True:
+            item = await self.trade_queue.get()
+            if item is QUEUE_SENTINEL:
+                self.trade_queue.task_done()
+                return
+
+            currency, trades = item
+            pending = {currency: list(trades)}
+            taken = 1
+            stopping = False
+
+            while taken < self.max_queue_batch and not self.trade_queue.empty():
+                item = self.trade_queue.get_nowait()
+                taken += 1
+                if item is QUEUE_SENTINEL:
+                    stopping = True
+                    break
+
+                currency, trades = item
+                pending.setdefault(currency, []).extend(trades)
+
+            try:
+                # Each currency commits on its own connection, so the transactions can overlap
+                await asyncio.gather(*(
+                    self._save_streamed_trades(currency, trades)
+                    for currency, trades in pending.items()
+                ))
+            finally:
+                for _ in range(taken):
+                    self.trade_queue.task_done()
+
+            if stopping:
+                return
+
+    async def _save_streamed_trades(self, currency: str, trades: List[Dict[str, Any]]):
+        # Read before _partition_trades swaps the millisecond timestamps for datetimes
+        latest = self._latest_timestamp(trades)
+        # Each streamed batch is one request, so successful/failed stay within total
+        self.stats['total_requests'] += 1
+        try:
+            await self._save_currency_trades(currency, trades)
+            self.stats['successful_requests'] += 1
+        except Exception as error:
+            self.logger.error(f"❌ Error saving {currency} trades: {error}")
+            self.stats['failed_requests'] += 1
+            self._mark_gap(currency)
+            return
+
+        # While a gap is open the watermark stays before it, so the next backfill covers it
+        if not self._has_gap(currency):
+            self._advance_watermark(currency, latest)
+
+    async def _backfill_trades(self, currencies: Optional[List[str]] = None):
+        end_timestamp = int(time.time() * 1000)
+        default_start = end_timestamp - 60_000
 
-            return trade
-        except Exception as e:
-            self.logger.error(f"Error processing trade: {e}")
-            return None
+        await asyncio.gather(*(
+            self._collect_currency(currency, self._last_trade_ts[currency] or default_start, end_timestamp)
+            for currency in (currencies or self.currency_pairs)
+        ))
+
+    async def _collect_currency(self, currency: str, start_timestamp: int, end_timestamp: int):
+        gap_events = self._gap_events[currency]
+        try:
+            self.stats['total_requests'] += 1
+
+            trades = await self._fetch_trades(currency, start_timestamp, end_timestamp)
+            latest = self._latest_timestamp(trades)
+
+            if trades:
+                await self._save_currency_trades(currency, trades)
+
+            # Pages come oldest first, so everything up to the newest fetched trade is now saved
+            self._advance_watermark(currency, latest)
+            if len(trades) < BACKFILL_PAGE_SIZE:
+                self._gaps_covered[currency] = max(self._gaps_covered[currency], gap_events)
+            else:
+                # The window was cut short; the next cycle continues from the watermark
+                self._mark_gap(currency)
+
+            self.stats['successful_requests'] += 1
+
+        except Exception as error:
+            self.logger.error(f"❌ Error fetching {currency} trades: {error}")
+            self.stats['failed_requests'] += 1
+            self._mark_gap(currency)
+
+    def _mark_gap(self, currency: str):
+        self._gap_events[currency] += 1
+
+    def _has_gap(self, currency: str) -> bool:
+        return self._gap_events[currency] > self._gaps_covered[currency]
+
+    def _advance_watermark(self, currency: str, timestamp: int):
+        if timestamp > (self._last_trade_ts[currency] or 0):
+            self._last_trade_ts[currency] = timestamp
+
+    @staticmethod
+    def _latest_timestamp(trades: List[Dict[str, Any]]) -> int:
+        return max((trade.get('timestamp') or 0 for trade in trades), default=0)
+
+    async def _save_currency_trades(self, currency: str, trades: List[Dict[str, Any]]):
+        processed_trades, block_trades = self._partition_trades(trades)
+
+        if not processed_trades:
+            return
+
+        all_table, block_table = self.table_names[currency]
+
+        # Both tables are written over one connection and committed together
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                saved_trades = await self.save_trades(processed_trades, all_table, conn=conn)
+
+                if block_trades:
+                    await self.save_trades(block_trades, block_table, conn=conn)
+
+        await self._check_large_trades(saved_trades)
+
+        if block_trades:
+            self.logger.info(f"Saved {len(block_trades)} block trades for {currency}")
 
     async def _fetch_trades(self, currency: str, start_timestamp: int, end_timestamp: int) -> List[Dict[str, Any]]:
         endpoint = f"{self.base_url}/public/get_last_trades_by_currency_and_time"
@@ -77,81 +333,111 @@ class DeribitCollector(BaseCollector):
             'currency': str(currency),
             'start_timestamp': int(start_timestamp),
             'end_timestamp': int(end_timestamp),
-            'count': 1000,
-            'include_old': 'false'
+            'count': BACKFILL_PAGE_SIZE,
+            'include_old': 'false',
+            'sorting': 'asc'
         }
 
-        try:
-            async with self.session.get(endpoint, params=params) as response:
-                if response.status != 200:
-                    response.raise_for_status()
+        async with self.session.get(endpoint, params=params) as response:
+            data = orjson.loads(await response.read())
 
-                data = await response.json()
+        if 'error' in data:
+            # Raised rather than read as an empty window, so an open gap stays open
+            raise RuntimeError(f"Deribit API error: {data['error']}")
 
-                if 'error' in data:
-                    return []
+        if 'result' in data and 'trades' in data['result']:
+            return data['result']['trades']
 
-                if 'result' in data and 'trades' in data['result']:
-                    return data['result']['trades']
+        return []
 
-                return []
+    async def _drain_trade_queue(self):
+        # Nothing would take the sentinel off a full queue once the writer is gone
+        if not self._writer_task.done():
+            await self.trade_queue.put(QUEUE_SENTINEL)
+        await asyncio.shield(self._writer_task)
 
-        except Exception as e:
-            raise
+    def _partition_trades(self, trades: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        options_trades = []
+        block_trades = []
+        fromtimestamp = datetime.fromtimestamp
+        utc = timezone.utc
+        append_option = options_trades.append
+        append_block = block_trades.append
 
-    def _filter_options(self, trades: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        filtered = []
-        for trade in trades:
-            instrument_name = trade.get('instrument_name', '')
-            if isinstance(instrument_name, str) and '-' in instrument_name:
-                parts = instrument_name.split('-')
-                if len(parts) >= 4 and parts[-1] in {'C', 'P'}:
-                    filtered.append(trade)
-        return filtered
-
-    def _filter_block_trades(self, trades: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        filtered = []
         for trade in trades:
-            block_trade_id = trade.get('block_trade_id')
+            get = trade.get
+            instrument_name = get('instrument_name')
+            if not (
+                isinstance(instrument_name, str)
+                and instrument_name.endswith(OPTION_SUFFIXES)
+                and instrument_name.count('-') >= 3
+            ):
+                continue
+
+            timestamp_ms = get('timestamp')
+            if timestamp_ms:
+                try:
+                    # Naive UTC, matching the server-side conversion the other collectors use
+                    trade['timestamp'] = fromtimestamp(timestamp_ms / 1000.0, tz=utc).replace(tzinfo=None)
+                except (TypeError, ValueError, OverflowError, OSError) as e:
+                    self.logger.error(f"Error processing trade: {e}")
+                    continue
+
+            append_option(trade)
+
+            block_trade_id = get('block_trade_id')
             if block_trade_id is not None and block_trade_id != '':
-                filtered.append(trade)
+                append_block(trade)
 
-        return filtered
+        return options_trades, block_trades
 
-    async def _insert_trade_async(self, conn, trade: Dict[str, Any], table_name: str):
-        query = f"""
-        INSERT INTO {table_name} (
-            trade_id, block_trade_leg_count, contracts, block_trade_id, combo_id, tick_direction,
-            mark_price, amount, trade_seq, instrument_name, index_price, direction, price, iv,
-            liquidation, combo_trade_id, timestamp
+    def _trade_to_record(self, trade: Dict[str, Any]) -> tuple:
+        get = trade.get
+        return (
+            str(get('trade_id', '')),
+            str(get('block_trade_leg_count', '')),
+            get('contracts'),
+            str(get('block_trade_id', '')),
+            str(get('combo_id', '')),
+            get('tick_direction'),
+            get('mark_price'),
+            get('amount'),
+            get('trade_seq'),
+            get('instrument_name'),
+            get('index_price'),
+            get('direction'),
+            get('price'),
+            get('iv'),
+            get('liquidation'),
+            str(get('combo_trade_id', '')),
+            get('timestamp')
         )
-        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16, $17)
-        """
-
-        await conn.execute(query,
-            str(trade.get('trade_id', '')),
-            str(trade.get('block_trade_leg_count', '')),
-            trade.get('contracts'),
-            str(trade.get('block_trade_id', '')),
-            str(trade.get('combo_id', '')),
-            trade.get('tick_direction'),
-            trade.get('mark_price'),
-            trade.get('amount'),
-            trade.get('trade_seq'),
-            trade.get('instrument_name'),
-            trade.get('index_price'),
-            trade.get('direction'),
-            trade.get('price'),
-            trade.get('iv'),
-            trade.get('liquidation'),
-            str(trade.get('combo_trade_id', '')),
-            trade.get('timestamp')
-        )
-
-    def _insert_trade(self, cursor, trade: Dict[str, Any], table_name: str):
-        pass
 
     async def stop(self):
+        self._stop_event.set()
+
+        if self._websocket is not None:
+            try:
+                await asyncio.wait_for(self._unsubscribe_from_market_trades(self._websocket), timeout=2)
+            except Exception as e:
+                self.logger.warning(f"Failed to unsubscribe from Deribit channels: {e}")
+
+        # Stop the stream first so nothing lands behind the sentinel
+        if self._ws_task:
+            self._ws_task.cancel()
+            await asyncio.gather(self._ws_task, return_exceptions=True)
+
+        if self._writer_task:
+            try:
+                await asyncio.wait_for(self._drain_trade_queue(), timeout=WRITER_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.logger.warning(f"Deribit writer did not drain in time, {self.trade_queue.qsize()} batches left")
+                self._writer_task.cancel()
+                await asyncio.gather(self._writer_task, return_exceptions=True)
+            except Exception as e:
+                # A crashed writer must not skip the rest of the shutdown
+                self.logger.error(f"Deribit writer failed, {self.trade_queue.qsize()} batches left: {e}")
+
         if self.session and not self.session.closed:
             await self.session.close()
         await super().stop()
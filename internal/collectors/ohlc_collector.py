@@ -1,10 +1,34 @@
 import asyncio
 import aiohttp
 import os
-from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+import time
+from typing import List, Optional
 from ..shared.base_collector import BaseCollector
 
+CANDLE_COLUMNS = (
+    'open_time', 'open_price', 'high_price', 'low_price', 'close_price',
+    'volume', 'close_time', 'quote_asset_volume', 'number_of_trades',
+    'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume',
+    'interval_type', 'exchange', 'symbol'
+)
+
+CANDLE_COLUMN_TYPES = (
+    'bigint', 'numeric', 'numeric', 'numeric', 'numeric',
+    'numeric', 'bigint', 'numeric', 'integer',
+    'numeric', 'numeric',
+    'text', 'text', 'text'
+)
+
+# Вся пачка одним запросом: колонки передаются массивами, RETURNING отдает только новые свечи.
+# timestamp считается на стороне базы из open_time, чтобы не создавать datetime на каждую свечу
+INSERT_CANDLES_SQL = """
+INSERT INTO {table_name} ({columns}, timestamp)
+SELECT candles.*, to_timestamp(candles.open_time / 1000.0) AT TIME ZONE 'UTC'
+FROM unnest({arrays}) AS candles({columns})
+ON CONFLICT (open_time, interval_type, exchange, symbol) DO NOTHING
+RETURNING open_time
+"""
+
 class OHLCCollector(BaseCollector):
     def __init__(self):
         super().__init__("ohlc")
@@ -27,24 +51,44 @@ class OHLCCollector(BaseCollector):
 
         self.rate_limit_delay = 0.1  # 100ms между запросами для соблюдения лимитов
 
+        self.table_names = {currency: f"ohlc_{currency.lower()}" for currency in self.currency_pairs}
+        self._insert_queries = {
+            table_name: INSERT_CANDLES_SQL.format(
+                table_name=table_name,
+                columns=', '.join(CANDLE_COLUMNS),
+                arrays=', '.join(f"${i}::{column_type}[]" for i, column_type in enumerate(CANDLE_COLUMN_TYPES, 1))
+            )
+            for table_name in self.table_names.values()
+        }
+
     async def _init_collector(self):
         timeout = aiohttp.ClientTimeout(total=30)
-        connector = aiohttp.TCPConnector(limit=100, limit_per_host=30)
+        connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=30,
+            ttl_dns_cache=300,
+            use_dns_cache=True,
+            enable_cleanup_closed=True
+        )
         self.session = aiohttp.ClientSession(
             timeout=timeout,
             connector=connector,
             headers={'User-Agent': 'Hedgie-OHLC-Collector/1.0'}
         )
 
+        # Неизменная часть URL собирается один раз, в запросе меняются только symbol/limit/startTime
+        self._klines_url_tpl = f"{self.base_url}/api/v3/klines?symbol={{symbol}}&interval={self.interval}&limit={{limit}}"
+
         # Проверяем последние сохраненные данные для каждой валюты
         await self._check_last_saved_data()
         self.logger.info("Successfully connected to Binance API")
 
     async def _check_last_saved_data(self):
         """Проверяем последние сохраненные данные для каждой валюты"""
+        current_time = time.time_ns() // 1_000_000
         for currency in self.currency_pairs:
             try:
-                table_name = f"ohlc_{currency.lower()}"
+                table_name = self.table_names[currency]
 
                 query = f"""
                 SELECT MAX(open_time) as last_timestamp
@@ -58,7 +102,6 @@ class OHLCCollector(BaseCollector):
                     if result:
                         self.collection_status[currency]['last_timestamp'] = result
                         # Если у нас есть данные до текущего времени минус 2 часа, считаем что догнали
-                        current_time = int(datetime.utcnow().timestamp() * 1000)
                         time_diff = current_time - result
                         if time_diff < 2 * 60 * 60 * 1000:  # меньше 2 часов
                             self.collection_status[currency]['catching_up'] = False
@@ -75,17 +118,20 @@ class OHLCCollector(BaseCollector):
                 self.collection_status[currency]['last_timestamp'] = self.earliest_timestamps[currency]
 
     async def _collect_data(self):
-        # Собираем данные для обеих валют
-        for currency in self.currency_pairs:
-            try:
-                await self._collect_currency_data(currency)
-                # Небольшая задержка между валютами
-                await asyncio.sleep(0.1)
-            except Exception as e:
-                self.logger.error(f"Error collecting data for {currency}: {e}")
+        # Собираем данные для всех валют параллельно, лимиты соблюдаются в _collect_currency_data
+        # Текущее время в мс считается один раз на цикл
+        now_ms = time.time_ns() // 1_000_000
+        results = await asyncio.gather(
+            *(self._collect_currency_data(currency, now_ms) for currency in self.currency_pairs),
+            return_exceptions=True
+        )
+
+        for currency, result in zip(self.currency_pairs, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"Error collecting data for {currency}: {result}")
                 self.stats['failed_requests'] += 1
 
-    async def _collect_currency_data(self, currency: str):
+    async def _collect_currency_data(self, currency: str, now_ms: int):
         """Собираем данные для конкретной валюты"""
         symbol = f"{currency}USDT"
         status = self.collection_status[currency]
@@ -110,23 +156,19 @@ class OHLCCollector(BaseCollector):
             candles = await self._fetch_klines(symbol, start_time, end_time, limit)
 
             if candles:
-                # Фильтруем новые свечи
-                new_candles = await self._filter_new_candles(candles, currency)
-
-                if new_candles:
-                    # Сохраняем новые свечи
-                    await self._save_candles(new_candles, currency)
+                # Сохраняем свечи, база сама отбрасывает уже существующие
+                new_open_times = await self._save_candles(self._build_candle_columns(candles, currency), currency)
 
+                if new_open_times:
                     # Обновляем последнюю метку времени
-                    last_candle_time = max(candle['open_time'] for candle in new_candles)
+                    last_candle_time = max(new_open_times)
                     status['last_timestamp'] = last_candle_time
 
-                    self.logger.info(f"{currency}: Saved {len(new_candles)} new candles, last timestamp: {last_candle_time}")
+                    self.logger.info(f"{currency}: Saved {len(new_open_times)} new candles, last timestamp: {last_candle_time}")
 
                     # Проверяем, догнали ли мы до текущего времени
                     if status['catching_up']:
-                        current_time = int(datetime.utcnow().timestamp() * 1000)
-                        time_diff = current_time - last_candle_time
+                        time_diff = now_ms - last_candle_time
 
                         if time_diff < 2 * 60 * 60 * 1000:  # меньше 2 часов
                             status['catching_up'] = False
@@ -149,24 +191,19 @@ class OHLCCollector(BaseCollector):
     async def _fetch_klines(self, symbol: str, start_time: Optional[int] = None,
                            end_time: Optional[int] = None, limit: int = 500) -> List[List]:
         """Получаем данные свечей с Binance API"""
-        endpoint = f"{self.base_url}/api/v3/klines"
-
-        params = {
-            'symbol': symbol,
-            'interval': self.interval,
-            'limit': min(limit, 1000)  # Максимум 1000 записей за запрос
-        }
+        # Максимум 1000 записей за запрос
+        url = self._klines_url_tpl.format(symbol=symbol, limit=min(limit, 1000))
 
         if start_time:
-            params['startTime'] = start_time + 1  # +1 чтобы не дублировать последнюю свечу
+            url += f"&startTime={start_time + 1}"  # +1 чтобы не дублировать последнюю свечу
 
         if end_time:
-            params['endTime'] = end_time
+            url += f"&endTime={end_time}"
 
         self.stats['total_requests'] += 1
 
         try:
-            async with self.session.get(endpoint, params=params) as response:
+            async with self.session.get(url) as response:
                 if response.status == 429:  # Rate limit
                     self.logger.warning(f"Rate limit hit for {symbol}, waiting...")
                     await asyncio.sleep(1)
@@ -184,132 +221,77 @@ class OHLCCollector(BaseCollector):
             self.logger.error(f"Error fetching klines for {symbol}: {e}")
             raise
 
-    async def _filter_new_candles(self, candles: List[List], currency: str) -> List[Dict[str, Any]]:
-        """Фильтруем только новые свечи, которых еще нет в базе"""
-        if not candles:
-            return []
-
-        # Получаем список уже существующих временных меток
-        table_name = f"ohlc_{currency.lower()}"
-        open_times = [int(candle[0]) for candle in candles]
-
-        query = f"""
-        SELECT open_time FROM {table_name}
-        WHERE open_time = ANY($1) AND interval_type = $2 AND exchange = 'binance'
-        """
-
-        async with self.db_pool.acquire() as connection:
-            existing_times = await connection.fetch(query, open_times, self.interval)
-            existing_set = {row['open_time'] for row in existing_times}
-
-        # Фильтруем только новые свечи
-        new_candles = []
+    def _build_candle_columns(self, candles: List[List], currency: str) -> List[list]:
+        """Транспонируем ответ Binance в колонки для unnest: одно приведение типа на колонку вместо цикла по свечам"""
+        rows = []
+        open_times = []
+        close_times = []
+        number_of_trades = []
         for candle in candles:
-            open_time = int(candle[0])
-            if open_time not in existing_set:
-                processed_candle = self._process_candle(candle, currency)
-                if processed_candle:
-                    new_candles.append(processed_candle)
+            if len(candle) < 11:
+                continue
 
-        return new_candles
+            # Битая свеча пропускается сама по себе, остальные из пачки сохраняются
+            try:
+                open_time, close_time, trades = int(candle[0]), int(candle[6]), int(candle[8])
+            except (TypeError, ValueError) as e:
+                self.logger.error(f"Skipping malformed {currency} candle {candle[0]!r}: {e}")
+                continue
 
-    def _process_candle(self, candle_data: List, currency: str) -> Dict[str, Any]:
-        """Обрабатываем данные свечи в нужный формат"""
-        try:
-            open_time = int(candle_data[0])
-
-            processed_candle = {
-                'open_time': open_time,
-                'open_price': float(candle_data[1]),
-                'high_price': float(candle_data[2]),
-                'low_price': float(candle_data[3]),
-                'close_price': float(candle_data[4]),
-                'volume': float(candle_data[5]),
-                'close_time': int(candle_data[6]),
-                'quote_asset_volume': float(candle_data[7]),
-                'number_of_trades': int(candle_data[8]),
-                'taker_buy_base_asset_volume': float(candle_data[9]),
-                'taker_buy_quote_asset_volume': float(candle_data[10]),
-                'interval_type': self.interval,
-                'exchange': 'binance',
-                'symbol': f"{currency}USDT",
-                'timestamp': datetime.fromtimestamp(open_time / 1000.0)
-            }
-
-            return processed_candle
+            rows.append(candle)
+            open_times.append(open_time)
+            close_times.append(close_time)
+            number_of_trades.append(trades)
 
-        except Exception as e:
-            self.logger.error(f"Error processing candle data: {e}")
-            return None
+        if not rows:
+            return []
 
-    async def _save_candles(self, candles: List[Dict[str, Any]], currency: str):
-        """Сохраняем свечи в базу данных"""
-        if not candles:
-            return
+        columns = list(zip(*rows))
+        count = len(rows)
+        # Цены и объемы Binance отдает десятичными строками: передаем их в NUMERIC как есть
+        return [
+            open_times,
+            list(columns[1]),
+            list(columns[2]),
+            list(columns[3]),
+            list(columns[4]),
+            list(columns[5]),
+            close_times,
+            list(columns[7]),
+            number_of_trades,
+            list(columns[9]),
+            list(columns[10]),
+            [self.interval] * count,
+            ['binance'] * count,
+            [f"{currency}USDT"] * count
+        ]
+
+    async def _save_candles(self, columns: List[list], currency: str) -> List[int]:
+        """Сохраняем свечи в базу данных одним запросом и возвращаем open_time только новых"""
+        if not columns:
+            return []
 
-        table_name = f"ohlc_{currency.lower()}"
+        table_name = self.table_names[currency]
 
         try:
-            async with self.db_pool.acquire() as conn:
-                saved_count = 0
+            async with self.write_limiter:
+                async with self.db_pool.acquire() as conn:
+                    rows = await conn.fetch(self._insert_queries[table_name], *columns)
+
+            inserted_times = [row[0] for row in rows]
 
-                for candle in candles:
-                    try:
-                        await self._insert_candle_async(conn, candle, table_name)
-                        saved_count += 1
-                    except Exception as e:
-                        # Вероятно, дублирование - пропускаем
-                        self.logger.debug(f"Skipping candle {candle['open_time']}: {e}")
-                        continue
+            saved_count = len(inserted_times)
+            self.stats['total_trades_saved'] += saved_count
 
-                self.stats['total_trades_saved'] += saved_count
+            if saved_count > 0:
+                self.logger.info(f"Saved {saved_count} new {currency} candles to {table_name}")
 
-                if saved_count > 0:
-                    self.logger.info(f"Saved {saved_count} new {currency} candles to {table_name}")
+            return inserted_times
 
         except Exception as error:
             self.logger.error(f"Error saving {currency} candles: {error}")
             raise error
 
-    async def _insert_candle_async(self, conn, candle: Dict[str, Any], table_name: str):
-        """Вставляем свечу в базу данных"""
-        query = f"""
-        INSERT INTO {table_name} (
-            open_time, open_price, high_price, low_price, close_price,
-            volume, close_time, quote_asset_volume, number_of_trades,
-            taker_buy_base_asset_volume, taker_buy_quote_asset_volume,
-            interval_type, exchange, symbol, timestamp
-        )
-        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15)
-        ON CONFLICT (open_time, interval_type, exchange, symbol) DO NOTHING
-        """
-
-        await conn.execute(query,
-            candle['open_time'],
-            candle['open_price'],
-            candle['high_price'],
-            candle['low_price'],
-            candle['close_price'],
-            candle['volume'],
-            candle['close_time'],
-            candle['quote_asset_volume'],
-            candle['number_of_trades'],
-            candle['taker_buy_base_asset_volume'],
-            candle['taker_buy_quote_asset_volume'],
-            candle['interval_type'],
-            candle['exchange'],
-            candle['symbol'],
-            candle['timestamp']
-        )
-
-    async def _insert_trade_async(self, conn, trade: Dict[str, Any], table_name: str):
-        """Заглушка для совместимости с базовым классом"""
-        pass
-
-    def _insert_trade(self, cursor, trade: Dict[str, Any], table_name: str):
-        """Заглушка для совместимости с базовым классом"""
-        pass
-
     async def stop(self):
         if self.session and not self.session.closed:
             await self.session.close()
@@ -1,18 +1,57 @@
 import asyncio
 import websockets
-import json
+from websockets.asyncio.client import connect as ws_connect
 import aiohttp
-from datetime import datetime
-from typing import Dict, Any, List
-from ..shared.base_collector import BaseCollector
+import orjson
+from operator import itemgetter
+from typing import Dict, Any, List, Optional
+from ..shared.base_collector import TradeCollector
+from ..shared.date_converter import normalize_okx_instrument_name
+
+QUEUE_SENTINEL = None
+CONSUMER_DRAIN_TIMEOUT = 10
+
+INSERT_TRADE_SQL = """
+INSERT INTO {table_name} (
+    trade_id, mark_price, amount, instrument_name, index_price,
+    direction, price, iv, timestamp
+)
+VALUES ($1, $2, $3, $4, $5, $6, $7, $8, to_timestamp($9::bigint / 1000.0) AT TIME ZONE 'UTC')
+ON CONFLICT (trade_id) DO NOTHING
+"""
+
+TRADE_RECORD = itemgetter(
+    'trade_id', 'mark_price', 'amount', 'instrument_name', 'index_price',
+    'direction', 'price', 'iv', 'timestamp'
+)
+
+class OKXCollector(TradeCollector):
+    _trade_to_record = staticmethod(TRADE_RECORD)
 
-class OKXCollector(BaseCollector):
     def __init__(self):
         super().__init__("okx")
         self.ws_url = 'wss://ws.okx.com:8443/ws/v5/public'
         self.currency_pairs = ['BTC-USD', 'ETH-USD']
+        self.table_names = {'BTC': 'okx_btc_trades', 'ETH': 'okx_eth_trades'}
+        self.family_currencies = {pair: pair.split('-')[0] for pair in self.currency_pairs}
+        # One frame subscribes every family; serialized once and resent on each reconnect
+        self._subscribe_payload = orjson.dumps({
+            "op": "subscribe",
+            "args": [
+                {"channel": "option-trades", "instType": "OPTION", "instFamily": pair}
+                for pair in self.currency_pairs
+            ]
+        }).decode()
+        self._insert_queries = {
+            table_name: INSERT_TRADE_SQL.format(table_name=table_name)
+            for table_name in self.table_names.values()
+        }
         self.websocket = None
         self.session = None
+        # Raw frames waiting to be parsed; recv only waits on this when it is full
+        self.frame_queue = asyncio.Queue(maxsize=10_000)
+        self._consumer_task: Optional[asyncio.Task] = None
+        self.max_batch_trades = 500
 
     async def _init_collector(self):
         timeout = aiohttp.ClientTimeout(total=30)
@@ -24,6 +63,8 @@ class OKXCollector(BaseCollector):
         )
         self.logger.info("Successfully connected to OKX API")
 
+        self._consumer_task = asyncio.create_task(self._consume_frames())
+
     async def _collect_data(self):
         max_retries = 5
         retry_count = 0
@@ -50,102 +91,139 @@ class OKXCollector(BaseCollector):
     async def _connect_and_subscribe(self):
         self.logger.info("Connecting to OKX WebSocket...")
 
-        async with websockets.connect(
+        async with ws_connect(
             self.ws_url,
             ping_interval=20,
             ping_timeout=10,
-            close_timeout=10
+            close_timeout=10,
+            max_size=10 ** 7,
+            # Trade frames are small; inflating every one costs more CPU than the bandwidth saves
+            compression=None
         ) as websocket:
             self.websocket = websocket
             self.logger.info("Connected to OKX WebSocket")
 
-            for currency in self.currency_pairs:
-                await self._subscribe_to_trades(websocket, currency)
+            await self._subscribe_to_trades(websocket)
 
+            # Dead peers are detected by ping_interval/ping_timeout, which raise ConnectionClosed
             while self.running:
                 try:
-                    message = await asyncio.wait_for(websocket.recv(), timeout=30)
-                    await self._process_message(message)
-
-                except asyncio.TimeoutError:
-                    self.logger.warning("WebSocket receive timeout")
-                    await websocket.ping()
+                    # Raw bytes, no intermediate str: the JSON parser takes them as-is
+                    await self.frame_queue.put(await websocket.recv(decode=False))
 
                 except websockets.exceptions.ConnectionClosed:
                     self.logger.warning("WebSocket connection lost")
                     break
 
-    async def _subscribe_to_trades(self, websocket, currency: str):
-        subscribe_message = {
-            "op": "subscribe",
-            "args": [{
-                "channel": "option-trades",
-                "instType": "OPTION",
-                "instFamily": currency
-            }]
-        }
+    async def _subscribe_to_trades(self, websocket):
+        await websocket.send(self._subscribe_payload)
+        self.logger.info(f"Subscribed to option trades for {', '.join(self.currency_pairs)}")
+
+    async def _consume_frames(self):
+        while True:
+            message = await self.frame_queue.get()
+            if message is QUEUE_SENTINEL:
+                self.frame_queue.task_done()
+                return
 
-        await websocket.send(json.dumps(subscribe_message))
-        self.logger.info(f"Subscribed to option trades for {currency}")
+            pending: Dict[str, List[Dict[str, Any]]] = {}
+            taken = 1
+            stopping = False
 
-    async def _process_message(self, message: str):
+            try:
+                # Coalesce frames that are already queued into one insert per table
+                pending_count = self._process_message(message, pending)
+                while pending_count < self.max_batch_trades and not self.frame_queue.empty():
+                    message = self.frame_queue.get_nowait()
+                    taken += 1
+                    if message is QUEUE_SENTINEL:
+                        stopping = True
+                        break
+
+                    pending_count += self._process_message(message, pending)
+
+                for table_name, trades in pending.items():
+                    try:
+                        await self.save_trades(trades, table_name)
+                        self.stats['successful_requests'] += 1
+                    except Exception as error:
+                        self.logger.error(f"Error saving trades to {table_name}: {error}")
+                        self.stats['failed_requests'] += 1
+            finally:
+                for _ in range(taken):
+                    self.frame_queue.task_done()
+
+            if stopping:
+                return
+
+    def _process_message(self, message: bytes, pending: Dict[str, List[Dict[str, Any]]]) -> int:
         try:
-            data = json.loads(message)
+            data = orjson.loads(message)
+
+            trades = data.get("data")
+            arg = data.get("arg")
 
-            if "data" in data and data.get("arg", {}).get("channel") == "option-trades":
-                trades = data["data"]
-                currency = data['arg']['instFamily'].split('-')[0]
+            if trades is not None and arg is not None and arg.get("channel") == "option-trades":
+                currency = self.family_currencies.get(arg["instFamily"]) or arg["instFamily"].split('-')[0]
 
-                self.logger.debug(f"Received {len(trades)} trades for {currency}")
+                debug_enabled = self.logger.is_debug_enabled()
+                if debug_enabled:
+                    self.logger.debug(f"Received {len(trades)} trades for {currency}")
 
                 processed_trades = []
                 for trade in trades:
                     processed_trade = self._process_trade(trade, currency)
                     if processed_trade:
                         processed_trades.append(processed_trade)
+                        if debug_enabled:
+                            self.logger.debug(
+                                f"Processed trade: {processed_trade['trade_id']} - {processed_trade['instrument_name']}"
+                            )
 
                 if processed_trades:
-                    table_name = f"okx_{currency.lower()}_trades"
-                    await self.save_trades(processed_trades, table_name)
-                    self.stats['successful_requests'] += 1
-
-            elif "event" in data:
-                if data["event"] == "subscribe":
-                    self.logger.info(f"Successfully subscribed to {data.get('arg', {})}")
-                elif data["event"] == "error":
+                    pending.setdefault(self.table_names[currency], []).extend(processed_trades)
+                return len(processed_trades)
+
+            else:
+                event = data.get("event")
+                if event == "subscribe":
+                    self.logger.info(f"Successfully subscribed to {arg}")
+                elif event == "error":
                     self.logger.error(f"OKX API error: {data}")
 
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             self.logger.error(f"Failed to parse JSON message: {e}")
         except Exception as e:
             self.logger.error(f"Error processing message: {e}")
 
+        return 0
+
     def _process_trade(self, trade: Dict[str, Any], currency: str) -> Dict[str, Any]:
+        get = trade.get
         try:
+            # Epoch milliseconds; the insert converts to a timestamp server-side
             timestamp_ms = int(trade['ts'])
-            timestamp_dt = datetime.fromtimestamp(timestamp_ms / 1000.0)
 
-            instrument_name = self._convert_instrument_name(trade.get('instId', ''))
+            instrument_name = self._convert_instrument_name(get('instId', ''))
 
-            amount = float(trade.get('sz', 0)) * 0.01
+            amount = float(get('sz', 0)) * 0.01
 
-            iv = None
-            if trade.get('fillVol') is not None:
-                iv = float(trade.get('fillVol', 0)) * 100
+            fill_vol = get('fillVol')
+            iv = float(fill_vol) * 100 if fill_vol is not None else None
 
+            # OKX prices are decimal strings; NUMERIC binds them exactly, a float goes through Decimal(float)
             processed_trade = {
                 'trade_id': trade['tradeId'],
-                'mark_price': self._safe_float(trade.get('markPx')),
+                'mark_price': get('markPx') or None,
                 'amount': amount,
                 'instrument_name': instrument_name,
-                'index_price': self._safe_float(trade.get('idxPx')),
-                'direction': trade.get('side'),
-                'price': self._safe_float(trade.get('px')),
+                'index_price': get('idxPx') or None,
+                'direction': get('side'),
+                'price': get('px') or None,
                 'iv': iv,
-                'timestamp': timestamp_dt
+                'timestamp': timestamp_ms
             }
 
-            self.logger.debug(f"Processed trade: {processed_trade['trade_id']} - {instrument_name}")
             return processed_trade
 
         except Exception as e:
@@ -153,69 +231,39 @@ class OKXCollector(BaseCollector):
             return None
 
     def _convert_instrument_name(self, okx_name: str) -> str:
-        try:
-            parts = okx_name.split('-')
-            if len(parts) != 5:
-                self.logger.warning(f"Unexpected instrument name format: {okx_name}")
-                return okx_name
-
-            currency = parts[0]
-            date_code = parts[2]
-            strike_price = parts[3]
-            option_type = parts[4]
-
-            date_obj = datetime.strptime(date_code, '%y%m%d')
-            formatted_date = date_obj.strftime('%d%b%y').upper()
-
-            deribit_format = f"{currency}-{formatted_date}-{strike_price}-{option_type}"
-            return deribit_format
-
-        except ValueError as e:
-            self.logger.error(f"Date conversion error for {okx_name}: {e}")
-            return okx_name
-        except Exception as e:
-            self.logger.error(f"Instrument name conversion error: {e}")
-            return okx_name
-
-    def _safe_float(self, value) -> float:
-        if value is None:
-            return None
-        try:
-            return float(value)
-        except (ValueError, TypeError):
-            return None
-
-    async def _insert_trade_async(self, conn, trade: Dict[str, Any], table_name: str):
-        query = f"""
-        INSERT INTO {table_name} (
-            trade_id, mark_price, amount, instrument_name, index_price,
-            direction, price, iv, timestamp
-        )
-        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-        """
-
-        await conn.execute(query,
-            trade['trade_id'],
-            trade['mark_price'],
-            trade['amount'],
-            trade['instrument_name'],
-            trade['index_price'],
-            trade['direction'],
-            trade['price'],
-            trade['iv'],
-            trade['timestamp']
-        )
-
-    def _insert_trade(self, cursor, trade: Dict[str, Any], table_name: str):
-        pass
+        deribit_name = normalize_okx_instrument_name(okx_name)
+        if deribit_name == okx_name:
+            self.logger.warning(f"Unexpected instrument name format: {okx_name}")
+        return deribit_name
 
     async def stop(self):
         self.logger.info("Stopping OKX collector...")
+        # Cleared before the socket closes so _collect_data does not reconnect
+        self.running = False
+        self._stop_event.set()
 
-        if self.websocket and not self.websocket.closed:
+        if self.websocket is not None:
             await self.websocket.close()
 
+        if self._consumer_task:
+            try:
+                await asyncio.wait_for(self._drain_frames(), timeout=CONSUMER_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.logger.warning(f"OKX consumer did not drain in time, {self.frame_queue.qsize()} frames left")
+                self._consumer_task.cancel()
+                await asyncio.gather(self._consumer_task, return_exceptions=True)
+            except Exception as e:
+                # A crashed consumer must not skip the rest of the shutdown
+                self.logger.error(f"OKX consumer failed, {self.frame_queue.qsize()} frames left: {e}")
+
         if self.session and not self.session.closed:
             await self.session.close()
 
         await super().stop()
+
+    async def _drain_frames(self):
+        # The sentinel queues behind the frames already received, so they are flushed first;
+        # nothing would take it off a full queue once the consumer is gone
+        if not self._consumer_task.done():
+            await self.frame_queue.put(QUEUE_SENTINEL)
+        await asyncio.shield(self._consumer_task)
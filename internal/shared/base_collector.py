@@ -1,17 +1,33 @@
 from abc import ABC, abstractmethod
 import asyncio
+import time
 from typing import Dict, Any, List
-from datetime import datetime, timedelta
+from datetime import datetime
 from .logger import CollectorLogger
+from .json_decoder import warm_up_decoders
 from cmd.db import db_manager
 from internal.telegram.notification_service import notification_service
 
+LARGE_TRADE_AMOUNT = 100000
+NOTIFICATION_CONCURRENCY = 16
+NOTIFICATION_DRAIN_TIMEOUT = 5
+
+EXISTING_TRADE_IDS_SQL = "SELECT trade_id FROM {table_name} WHERE trade_id = ANY($1)"
+
 class BaseCollector(ABC):
     def __init__(self, name: str):
         self.name = name
         self.logger = CollectorLogger(name)
         self.running = False
+        self._stop_event = asyncio.Event()
+        self._data_event = asyncio.Event()
+        # Alerts are sent off the collection path; the set keeps the tasks referenced until done
+        self._notification_tasks = set()
+        self._notification_limiter = asyncio.Semaphore(NOTIFICATION_CONCURRENCY)
         self.db_pool = None
+        self.write_limiter = None
+        # table name -> INSERT text, filled in by the subclasses
+        self._insert_queries: Dict[str, str] = {}
         self.stats = {
             'total_requests': 0,
             'successful_requests': 0,
@@ -21,10 +37,15 @@ class BaseCollector(ABC):
         self.last_data_time = None
         self.error_streak = 0
         self.status_update_interval = 60
+        self.no_data_timeout = 600
+        self.error_alert_interval = 60
+        self._next_error_alert = 0.0
 
     async def init(self):
         self.logger.info("Initializing collector")
         self.db_pool = db_manager.pool
+        self.write_limiter = db_manager.write_limiter
+        warm_up_decoders()
         await self._init_collector()
         self.logger.info("Collector initialized successfully")
 
@@ -44,12 +65,14 @@ class BaseCollector(ABC):
         monitor_task = asyncio.create_task(self._data_monitor())
 
         try:
-            while self.running:
+            while self.running and not self._stop_event.is_set():
                 try:
-                    await self._collect_data()
-                    self.last_data_time = datetime.utcnow()
+                    # A collector that streams in the background returns False when nothing arrived
+                    if await self._collect_data() is not False:
+                        self.last_data_time = datetime.utcnow()
+                        self._data_event.set()
                     self.error_streak = 0
-                    await asyncio.sleep(config.collectors.collection_interval)
+                    await self._wait_for_stop(config.collectors.collection_interval)
 
                 except Exception as error:
                     self.logger.error("Error in collection cycle", error)
@@ -58,7 +81,7 @@ class BaseCollector(ABC):
 
                     await self._handle_error(error)
 
-                    await asyncio.sleep(config.collectors.collection_interval)
+                    await self._wait_for_stop(config.collectors.collection_interval)
         finally:
             status_task.cancel()
             monitor_task.cancel()
@@ -73,10 +96,18 @@ class BaseCollector(ABC):
             except asyncio.CancelledError:
                 pass
 
+    async def _wait_for_stop(self, timeout: float):
+        # Sleeps between cycles but returns as soon as stop() is called
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
     async def _status_updater(self):
         while self.running:
             try:
-                await notification_service.update_collector_status(self.name, self.stats.copy())
+                # update_collector_status merges the counters into a fresh dict, so no copy here
+                await notification_service.update_collector_status(self.name, self.stats)
                 await asyncio.sleep(self.status_update_interval)
             except asyncio.CancelledError:
                 break
@@ -87,13 +118,18 @@ class BaseCollector(ABC):
     async def _data_monitor(self):
         while self.running:
             try:
-                await asyncio.sleep(300)
+                # Woken by every successful cycle; only a full timeout without one is a stall
+                self._data_event.clear()
+                try:
+                    await asyncio.wait_for(self._data_event.wait(), timeout=self.no_data_timeout)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
 
                 if self.last_data_time:
                     time_since_data = datetime.utcnow() - self.last_data_time
-                    if time_since_data > timedelta(minutes=10):
-                        minutes = int(time_since_data.total_seconds() / 60)
-                        await notification_service.notify_no_data(self.name, minutes)
+                    minutes = int(time_since_data.total_seconds() / 60)
+                    self._notify_in_background(notification_service.notify_no_data(self.name, minutes))
 
             except asyncio.CancelledError:
                 break
@@ -101,68 +137,129 @@ class BaseCollector(ABC):
                 self.logger.error(f"Error in data monitor: {e}")
 
     async def _handle_error(self, error: Exception):
+        # At most one burst of error alerts per interval, however often the cycle fails
+        now = time.monotonic()
+        if now < self._next_error_alert:
+            return
+
+        alerted = False
         if self.error_streak >= 5:
-            await notification_service.notify_connection_error(self.name, str(error))
+            self._notify_in_background(notification_service.notify_connection_error(self.name, str(error)))
+            alerted = True
 
         if self.stats['total_requests'] > 20:
             error_rate = (self.stats['failed_requests'] / self.stats['total_requests']) * 100
             if error_rate > 50:
-                await notification_service.notify_high_error_rate(self.name, error_rate)
+                self._notify_in_background(notification_service.notify_high_error_rate(self.name, error_rate))
+                alerted = True
+
+        if alerted:
+            self._next_error_alert = now + self.error_alert_interval
 
     @abstractmethod
     async def _collect_data(self):
         pass
 
+    def _notify_in_background(self, notification):
+        task = asyncio.create_task(self._send_notification(notification))
+        self._notification_tasks.add(task)
+        task.add_done_callback(self._notification_tasks.discard)
+
+    async def _send_notification(self, notification):
+        async with self._notification_limiter:
+            try:
+                await notification
+            except Exception as e:
+                self.logger.error("Failed to send notification", e)
+
     async def stop(self):
         self.running = False
+        self._stop_event.set()
         self.logger.info("Collector stopped")
         self._log_stats()
 
+        if self._notification_tasks:
+            await asyncio.wait(set(self._notification_tasks), timeout=NOTIFICATION_DRAIN_TIMEOUT)
+
         await notification_service.notify_collector_stopped(self.name)
 
     def _log_stats(self):
         self.logger.info(f"Final stats: {self.stats}")
 
-    async def save_trades(self, trades: List[Dict[str, Any]], table_name: str):
+class TradeCollector(BaseCollector):
+    def __init__(self, name: str):
+        super().__init__(name)
+        # table name -> existence check, built on first use
+        self._existing_queries: Dict[str, str] = {}
+
+    async def save_trades(self, trades: List[Dict[str, Any]], table_name: str, conn=None) -> List[Dict[str, Any]]:
         if not trades:
-            return
+            return []
 
         try:
-            async with self.db_pool.acquire() as conn:
-                saved_count = 0
-
-                for trade in trades:
-                    existing = await conn.fetchval(
-                        f"SELECT 1 FROM {table_name} WHERE trade_id = $1 LIMIT 1",
-                        trade['trade_id']
-                    )
-
-                    if existing:
-                        continue
+            async with self.write_limiter:
+                if conn is None:
+                    async with self.db_pool.acquire() as own_conn:
+                        saved_trades = await self._insert_trades_async(own_conn, trades, table_name)
+                else:
+                    saved_trades = await self._insert_trades_async(conn, trades, table_name)
 
-                    await self._insert_trade_async(conn, trade, table_name)
-                    saved_count += 1
+            # Alerts go out once the connection and writer slot are released; a caller
+            # that passes its own transaction alerts after it commits
+            if conn is None:
+                await self._check_large_trades(saved_trades)
 
-                    await self._check_large_trade(trade)
+            saved_count = len(saved_trades)
+            self.stats['total_trades_saved'] += saved_count
+            if saved_count > 0:
+                self.logger.info(f"Saved {saved_count} new trades to {table_name}")
 
-                self.stats['total_trades_saved'] += saved_count
-                if saved_count > 0:
-                    self.logger.info(f"Saved {saved_count} new trades to {table_name}")
+            return saved_trades
 
         except Exception as error:
             self.logger.error("Error saving trades", error)
-            await notification_service.notify_database_error(self.name, str(error))
+            self._notify_in_background(notification_service.notify_database_error(self.name, str(error)))
             raise error
 
-    async def _check_large_trade(self, trade: Dict[str, Any]):
-        amount = trade.get('amount', 0)
+    async def _check_large_trades(self, trades: List[Dict[str, Any]]):
+        # One alert per saved batch, however many large trades it contains
+        large_trades = [trade for trade in trades if (trade.get('amount') or 0) > LARGE_TRADE_AMOUNT]
 
-        if amount > 100000:
-            await notification_service.notify_large_trade(self.name, trade)
+        if large_trades:
+            self._notify_in_background(notification_service.notify_large_trades(self.name, large_trades))
 
-    async def _insert_trade_async(self, conn, trade: Dict[str, Any], table_name: str):
-        pass
+    async def _insert_trades_async(self, conn, trades: List[Dict[str, Any]], table_name: str) -> List[Dict[str, Any]]:
+        records = [self._trade_to_record(trade) for trade in trades]
+        return await self._insert_new_records_async(
+            conn, trades, records, table_name, self._insert_queries[table_name]
+        )
 
     @abstractmethod
-    def _insert_trade(self, cursor, trade: Dict[str, Any], table_name: str):
+    def _trade_to_record(self, trade: Dict[str, Any]) -> tuple:
         pass
+
+    async def _insert_new_records_async(self, conn, trades: List[Dict[str, Any]], records: List[tuple],
+                                        table_name: str, query: str) -> List[Dict[str, Any]]:
+        existing_query = self._existing_queries.get(table_name)
+        if existing_query is None:
+            existing_query = self._existing_queries[table_name] = EXISTING_TRADE_IDS_SQL.format(table_name=table_name)
+
+        rows = await conn.fetch(existing_query, [record[0] for record in records])
+        existing = {row[0] for row in rows}
+
+        new_trades = []
+        new_records = []
+        for trade, record in zip(trades, records):
+            trade_id = record[0]
+            # Also drops repeats inside the batch, e.g. a backfilled trade that was streamed as well
+            if trade_id not in existing:
+                existing.add(trade_id)
+                new_trades.append(trade)
+                new_records.append(record)
+
+        if new_records:
+            # executemany goes through the connection's statement cache, keyed by SQL text;
+            # conn.prepare() would bypass it and re-prepare the INSERT on every batch
+            await conn.executemany(query, new_records)
+
+        return new_trades
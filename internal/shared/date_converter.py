@@ -1,17 +1,50 @@
-from datetime import datetime
+from datetime import date
+from functools import lru_cache
+from typing import Optional
 
-def normalize_binance_instrument_name(instrument_name: str) -> str:
+MONTHS = ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC')
+
+def format_expiry(date_part: str) -> Optional[str]:
+    # YYMMDD -> DDMONYY by slicing; strptime/strftime are far slower for this fixed format
+    # isdigit() alone also accepts digits such as '²' or Arabic-Indic numerals
+    if len(date_part) != 6 or not (date_part.isascii() and date_part.isdigit()):
+        return None
+
+    # Rejects impossible dates such as 250231, as the strptime parse did
     try:
-        parts = instrument_name.split('-')
-        if len(parts) != 4:
-            return instrument_name
+        month = int(date_part[2:4])
+        date(2000 + int(date_part[0:2]), month, int(date_part[4:6]))
+    except ValueError:
+        return None
+
+    return f"{date_part[4:6]}{MONTHS[month - 1]}{date_part[0:2]}"
+
+# Called for every streamed Binance trade, but the set of live option symbols is small
+@lru_cache(maxsize=8192)
+def normalize_binance_instrument_name(instrument_name: str) -> str:
+    parts = instrument_name.split('-')
+    if len(parts) != 4:
+        return instrument_name
+
+    currency, date_part, strike, option_type = parts
+
+    normalized_date = format_expiry(date_part)
+    if normalized_date is None:
+        return instrument_name
 
-        currency, date_part, strike, option_type = parts
+    return f"{currency}-{normalized_date}-{strike}-{option_type}"
 
-        date_obj = datetime.strptime(date_part, '%y%m%d')
-        normalized_date = date_obj.strftime('%d%b%y').upper()
+# Only a few thousand OKX option ids are live at once, so each one is parsed once
+@lru_cache(maxsize=8192)
+def normalize_okx_instrument_name(instrument_name: str) -> str:
+    parts = instrument_name.split('-')
+    if len(parts) != 5:
+        return instrument_name
 
-        return f"{currency}-{normalized_date}-{strike}-{option_type}"
+    currency, _, date_part, strike, option_type = parts
 
-    except Exception:
+    normalized_date = format_expiry(date_part)
+    if normalized_date is None:
         return instrument_name
+
+    return f"{currency}-{normalized_date}-{strike}-{option_type}"
@@ -5,6 +5,11 @@ from logging.handlers import RotatingFileHandler
 from datetime import datetime
 
 def setup_logger():
+    # basicConfig would ignore a second call anyway, but only after the handlers below
+    # were built, leaving an extra open handle on the log file
+    if logging.getLogger().handlers:
+        return
+
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()
     log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
@@ -30,18 +35,29 @@ class CollectorLogger:
     def __init__(self, collector_name: str):
         self.logger = logging.getLogger(f"collector.{collector_name}")
         self.collector_name = collector_name
+        self._prefix = f"[{collector_name}] "
 
+    # %-style arguments are only joined by a handler that actually emits the record
     def info(self, message: str, **kwargs):
-        self.logger.info(f"[{self.collector_name}] {message}", extra=kwargs)
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("%s%s", self._prefix, message, extra=kwargs)
 
     def error(self, message: str, error: Exception = None, **kwargs):
+        if not self.logger.isEnabledFor(logging.ERROR):
+            return
         if error:
-            self.logger.error(f"[{self.collector_name}] {message}: {error}", extra=kwargs)
+            self.logger.error("%s%s: %s", self._prefix, message, error, extra=kwargs)
         else:
-            self.logger.error(f"[{self.collector_name}] {message}", extra=kwargs)
+            self.logger.error("%s%s", self._prefix, message, extra=kwargs)
 
     def warning(self, message: str, **kwargs):
-        self.logger.warning(f"[{self.collector_name}] {message}", extra=kwargs)
+        if self.logger.isEnabledFor(logging.WARNING):
+            self.logger.warning("%s%s", self._prefix, message, extra=kwargs)
+
+    def is_debug_enabled(self) -> bool:
+        # Lets hot paths skip building debug messages that would be dropped anyway
+        return self.logger.isEnabledFor(logging.DEBUG)
 
     def debug(self, message: str, **kwargs):
-        self.logger.debug(f"[{self.collector_name}] {message}", extra=kwargs)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("%s%s", self._prefix, message, extra=kwargs)
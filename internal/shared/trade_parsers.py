@@ -0,0 +1,87 @@
+import time
+from datetime import datetime, timezone
+from typing import Any, Container, Dict, Optional
+
+from .date_converter import normalize_binance_instrument_name
+
+# Pure, fully annotated field extraction kept free of collector state,
+# so the module can be compiled with mypyc without touching the callers
+
+def safe_float(value: Any) -> Optional[float]:
+    # Numeric JSON already arrives as float/int; only strings need parsing
+    if isinstance(value, float):
+        return value
+    if isinstance(value, int):
+        return float(value)
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+def parse_binance_trade(trade_data: Dict[str, Any], seen_ids: Container[int]) -> Optional[Dict[str, Any]]:
+    symbol = trade_data.get('s', '')
+    trade_id_raw = trade_data.get('t', '')
+    price_raw = trade_data.get('p', '')
+    quantity_raw = trade_data.get('q', '')
+    direction_code = trade_data.get('S', '1')
+    trade_time = trade_data.get('T', 0)
+
+    try:
+        trade_id = int(trade_id_raw) if trade_id_raw else None
+        price = float(price_raw) if price_raw else None
+        quantity = float(quantity_raw) if quantity_raw else None
+    except (ValueError, TypeError):
+        return None
+
+    if not symbol or trade_id is None or price is None or quantity is None:
+        return None
+
+    if trade_id in seen_ids:
+        return None
+
+    # Epoch seconds; the insert converts to a timestamp server-side
+    if isinstance(trade_time, (int, float)) and trade_time > 0:
+        timestamp = trade_time / 1000.0 if trade_time > 1e12 else float(trade_time)
+    else:
+        timestamp = time.time()
+
+    direction = "sell" if str(direction_code) == "-1" else "buy"
+    abs_quantity = abs(quantity)
+
+    return {
+        'trade_id': trade_id,
+        'contracts': abs_quantity,
+        'amount': abs_quantity * price,
+        'instrument_name': normalize_binance_instrument_name(symbol),
+        'direction': direction,
+        'price': price,
+        'timestamp': timestamp
+    }
+
+def parse_bybit_trade(trade: Dict[str, Any]) -> Dict[str, Any]:
+    price = safe_float(trade.get("price"))
+    size = safe_float(trade.get("size"))
+    timestamp = trade.get("time", "")
+
+    trade_timestamp = None
+    if timestamp:
+        try:
+            # Naive UTC, matching the server-side conversion the other collectors use
+            trade_timestamp = datetime.fromtimestamp(int(timestamp) / 1000, tz=timezone.utc).replace(tzinfo=None)
+        except (ValueError, TypeError):
+            trade_timestamp = datetime.utcnow()
+
+    return {
+        "trade_id": trade.get("execId", ""),
+        "contracts": size,
+        "mark_price": safe_float(trade.get("mP")),
+        "amount": price * size if price and size else None,
+        "instrument_name": trade.get("symbol", ""),
+        "index_price": safe_float(trade.get("iP")),
+        "direction": trade.get("side", ""),
+        "price": price,
+        "iv": safe_float(trade.get("iv")),
+        "timestamp": trade_timestamp
+    }
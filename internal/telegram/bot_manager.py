@@ -1,8 +1,10 @@
 import asyncio
 import logging
-from typing import Dict, Optional
-from datetime import datetime, timedelta
-from aiogram import Bot, Dispatcher, types
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+from aiogram import Bot, Dispatcher, F, types
 from aiogram.filters import Command
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
@@ -11,14 +13,36 @@ from cmd.db import db_manager
 
 logger = logging.getLogger(__name__)
 
+STATS_TABLES = (
+    ('all_btc_trades', 'Deribit BTC'),
+    ('all_eth_trades', 'Deribit ETH'),
+    ('okx_btc_trades', 'OKX BTC'),
+    ('okx_eth_trades', 'OKX ETH'),
+    ('bybit_btc_trades', 'Bybit BTC'),
+    ('bybit_eth_trades', 'Bybit ETH'),
+    ('binance_btc_trades', 'Binance BTC'),
+    ('binance_eth_trades', 'Binance ETH'),
+    ('ohlc_btc', 'OHLC BTC'),
+    ('ohlc_eth', 'OHLC ETH')
+)
+
+# Indexed by the collector's connected flag
+STATUS_ICONS = ("🔴", "🟢")
+
+# Full-table counts are expensive; repeated button presses reuse the last answer
+STATS_CACHE_TTL = 30
+
 class TelegramBotManager:
     def __init__(self):
         self.bot: Optional[Bot] = None
         self.dp: Optional[Dispatcher] = None
         self.running = False
         self.admin_chat_id = config.telegram.admin_chat_id
-        self.alert_cache: Dict[str, datetime] = {}
+        # alert key -> last send time (monotonic), oldest first; expired keys are pruned on each send
+        self.alert_cache: OrderedDict[Tuple[str, str, str], float] = OrderedDict()
+        self.max_alert_cache_size = 2048
         self.collector_statuses: Dict[str, Dict] = {}
+        self._stats_cache: Optional[Tuple[float, str]] = None
 
         self.main_keyboard = ReplyKeyboardMarkup(
             keyboard=[
@@ -65,12 +89,12 @@ class TelegramBotManager:
                 reply_markup=self.main_keyboard
             )
 
-        @self.dp.message(lambda message: message.text == "📊")
+        @self.dp.message(F.text == "📊")
         async def status_button_handler(message: types.Message):
             status_text = await self._get_status_message()
             await message.answer(status_text, parse_mode="Markdown")
 
-        @self.dp.message(lambda message: message.text == "📈")
+        @self.dp.message(F.text == "📈")
         async def stats_button_handler(message: types.Message):
             stats_text = await self._get_stats_message()
             await message.answer(stats_text, parse_mode="Markdown")
@@ -111,17 +135,20 @@ class TelegramBotManager:
         if not self.bot or not self.admin_chat_id:
             return
 
-        alert_key = f"{collector_name}_{level}_{hash(message)}"
-        now = datetime.utcnow()
+        # Plain tuple key: no formatted string per call, and the message's str hash is cached
+        alert_key = (collector_name, level, message)
+        sent_at = time.monotonic()
+        self._prune_alert_cache(sent_at - config.telegram.alert_cooldown)
 
         if alert_key in self.alert_cache:
-            last_sent = self.alert_cache[alert_key]
-            if now - last_sent < timedelta(seconds=config.telegram.alert_cooldown):
-                return
+            return
 
-        self.alert_cache[alert_key] = now
+        self.alert_cache[alert_key] = sent_at
+        if len(self.alert_cache) > self.max_alert_cache_size:
+            self.alert_cache.popitem(last=False)
 
-        timestamp = now.strftime("%H:%M:%S")
+        # Wall-clock time is only needed for messages that actually go out
+        timestamp = datetime.utcnow().strftime("%H:%M:%S")
         message = f"🕐 {timestamp}\n{message}"
 
         try:
@@ -133,7 +160,17 @@ class TelegramBotManager:
         except Exception as e:
             logger.error(f"Failed to send telegram notification: {e}")
 
+    def _prune_alert_cache(self, cutoff: float):
+        # Entries are only ever appended with the current time, so expired ones sit at the front
+        alert_cache = self.alert_cache
+        while alert_cache:
+            alert_key, last_sent = next(iter(alert_cache.items()))
+            if last_sent > cutoff:
+                break
+            del alert_cache[alert_key]
+
     async def update_collector_status(self, collector_name: str, status: Dict):
+        # Statuses are replaced whole, never mutated, so readers can hold onto an old one safely
         old_status = self.collector_statuses.get(collector_name, {})
         self.collector_statuses[collector_name] = status
 
@@ -162,9 +199,9 @@ class TelegramBotManager:
         if not self.collector_statuses:
             return "📊 *Статус коллекторов*\n\nДанные пока не поступали"
 
-        message = "📊 *Статус коллекторов*\n\n"
+        lines = ["📊 *Статус коллекторов*", ""]
 
-        for collector_name, status in self.collector_statuses.items():
+        for collector_name, status in list(self.collector_statuses.items()):
             connected = status.get('connected', False)
             total_requests = status.get('total_requests', 0)
             successful_requests = status.get('successful_requests', 0)
@@ -172,71 +209,84 @@ class TelegramBotManager:
             trades_saved = status.get('total_trades_saved', 0)
             last_activity = status.get('last_activity')
 
-            status_icon = "🟢" if connected else "🔴"
             success_rate = (successful_requests / total_requests * 100) if total_requests > 0 else 0
 
-            message += f"{status_icon} *{collector_name.upper()}*\n"
-            message += f"   Запросов: {total_requests}\n"
-            message += f"   Успешных: {successful_requests} ({success_rate:.1f}%)\n"
-            message += f"   Ошибок: {failed_requests}\n"
-            message += f"   Торгов сохранено: {trades_saved}\n"
+            lines.append(f"{STATUS_ICONS[bool(connected)]} *{collector_name.upper()}*")
+            lines.append(f"   Запросов: {total_requests}")
+            lines.append(f"   Успешных: {successful_requests} ({success_rate:.1f}%)")
+            lines.append(f"   Ошибок: {failed_requests}")
+            lines.append(f"   Торгов сохранено: {trades_saved}")
 
             if last_activity:
-                message += f"   Последняя активность: {last_activity.strftime('%H:%M:%S')}\n"
+                lines.append(f"   Последняя активность: {last_activity.strftime('%H:%M:%S')}")
 
-            message += "\n"
+            lines.append("")
 
-        return message
+        return "\n".join(lines)
 
     async def _get_stats_message(self) -> str:
+        now = time.monotonic()
+        if self._stats_cache and now - self._stats_cache[0] < STATS_CACHE_TTL:
+            return self._stats_cache[1]
+
         try:
             async with db_manager.pool.acquire() as conn:
-                tables = [
-                    ('all_btc_trades', 'Deribit BTC'),
-                    ('all_eth_trades', 'Deribit ETH'),
-                    ('okx_btc_trades', 'OKX BTC'),
-                    ('okx_eth_trades', 'OKX ETH'),
-                    ('bybit_btc_trades', 'Bybit BTC'),
-                    ('bybit_eth_trades', 'Bybit ETH'),
-                    ('binance_btc_trades', 'Binance BTC'),
-                    ('binance_eth_trades', 'Binance ETH'),
-                    ('ohlc_btc', 'OHLC BTC'),
-                    ('ohlc_eth', 'OHLC ETH')
-                ]
-
-                message = "📈 *Статистика по торгам*\n\n"
-                total_trades = 0
+                rows = await conn.fetch(
+                    "SELECT table_name::text FROM information_schema.tables WHERE table_name::text = ANY($1::text[])",
+                    [table_name for table_name, _ in STATS_TABLES]
+                )
+                existing = {row['table_name'] for row in rows}
 
-                for table_name, display_name in tables:
-                    try:
-                        count_query = f"""
-                        SELECT COUNT(*) as count
-                        FROM information_schema.tables
-                        WHERE table_name = '{table_name}'
-                        """
-                        table_exists = await conn.fetchval(count_query)
+                counts = await self._count_trades(conn, [
+                    table_name for table_name, _ in STATS_TABLES if table_name in existing
+                ])
 
-                        if table_exists > 0:
-                            trades_query = f"SELECT COUNT(*) FROM {table_name}"
-                            count = await conn.fetchval(trades_query)
+            lines = ["📈 *Статистика по торгам*", ""]
+            total_trades = 0
 
-                            if count > 0:
-                                message += f"📊 *{display_name}*: {count:,} торгов\n"
-                                total_trades += count
+            for table_name, display_name in STATS_TABLES:
+                count = counts.get(table_name, 0)
+                if count > 0:
+                    lines.append(f"📊 *{display_name}*: {count:,} торгов")
+                    total_trades += count
 
-                    except Exception as e:
-                        logger.error(f"Error getting stats for {table_name}: {e}")
-                        continue
+            if total_trades == 0:
+                lines.append("Торги пока не собраны")
+            else:
+                lines.append("")
+                lines.append(f"📊 *Всего торгов*: {total_trades:,}")
 
-                if total_trades == 0:
-                    message += "Торги пока не собраны"
-                else:
-                    message += f"\n📊 *Всего торгов*: {total_trades:,}"
+            message = "\n".join(lines)
 
-                return message
+            self._stats_cache = (now, message)
+            return message
 
         except Exception as e:
             logger.error(f"Error getting stats: {e}")
             return "❌ Ошибка получения статистики"
 
+    async def _count_trades(self, conn, table_names: List[str]) -> Dict[str, int]:
+        if not table_names:
+            return {}
+
+        try:
+            # One round trip for every count instead of one per table
+            counts_query = " UNION ALL ".join(
+                f"SELECT '{table_name}' AS table_name, COUNT(*) AS count FROM {table_name}"
+                for table_name in table_names
+            )
+            return {row['table_name']: row['count'] for row in await conn.fetch(counts_query)}
+        except Exception as e:
+            logger.warning(f"Combined stats query failed, counting tables one by one: {e}")
+
+        # A broken table only loses its own line
+        counts = {}
+        for table_name in table_names:
+            try:
+                counts[table_name] = await conn.fetchval(f"SELECT COUNT(*) FROM {table_name}")
+            except Exception as e:
+                logger.error(f"Error getting stats for {table_name}: {e}")
+
+        return counts
+
 telegram_manager = TelegramBotManager()
@@ -1,11 +1,14 @@
 import asyncio
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List
 from datetime import datetime
 from .bot_manager import telegram_manager
 
 logger = logging.getLogger(__name__)
 
+# Longer bursts end with an "... и еще N" line to stay well under Telegram's message limit
+MAX_LISTED_TRADES = 10
+
 class NotificationService:
     def __init__(self):
         self.enabled = True
@@ -32,6 +35,46 @@ class NotificationService:
             collector_name=collector_name
         )
 
+    async def notify_database_error(self, collector_name: str, error: str):
+        await telegram_manager.send_notification(
+            f"🗄 *{collector_name}* ошибка базы данных\n"
+            f"```\n{str(error)[:100]}...\n```",
+            level="error",
+            collector_name=collector_name
+        )
+
+    async def notify_no_data(self, collector_name: str, minutes: int):
+        await telegram_manager.send_notification(
+            f"⚠️ *{collector_name}* нет данных {minutes} мин",
+            level="warning",
+            collector_name=collector_name
+        )
+
+    async def notify_high_error_rate(self, collector_name: str, error_rate: float):
+        await telegram_manager.send_notification(
+            f"⚠️ *{collector_name}* высокий процент ошибок: {error_rate:.1f}%",
+            level="warning",
+            collector_name=collector_name
+        )
+
+    async def notify_large_trades(self, collector_name: str, trades: List[Dict[str, Any]]):
+        lines = [f"🐋 *{collector_name}* крупные сделки: {len(trades)}"]
+
+        for trade in trades[:MAX_LISTED_TRADES]:
+            lines.append(
+                f"`{trade.get('instrument_name')}` {trade.get('direction') or ''} "
+                f"{trade.get('amount') or 0:,.0f}"
+            )
+
+        if len(trades) > MAX_LISTED_TRADES:
+            lines.append(f"... и еще {len(trades) - MAX_LISTED_TRADES}")
+
+        await telegram_manager.send_notification(
+            "\n".join(lines),
+            level="info",
+            collector_name=collector_name
+        )
+
     async def update_collector_status(self, collector_name: str, stats: Dict[str, Any]):
         status = {
             **stats,